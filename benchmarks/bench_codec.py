@@ -0,0 +1,61 @@
+"""
+The JSON codecs on realistic work: decoding participant pages, encoding
+upsert bodies, and escaping CSV for a spooled upsert body.
+
+    python benchmarks/bench_codec.py --page-size 500
+"""
+
+import argparse
+import json
+import time
+
+from signalvine_sdk.codec import get_codec
+from signalvine_sdk.common import make_body
+from stand_in_server import make_participant
+from bench_upsert_body import make_frame
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = json.dumps(
+        {"items": [make_participant("bench", n) for n in range(args.page_size)]}
+    ).encode()
+    body = make_body("bench", make_frame(args.rows))
+    print(
+        f"page of {len(page) / 2 ** 20:.1f} MiB, "
+        f"upsert body of {len(body['participants']) / 2 ** 20:.1f} MiB"
+    )
+
+    for name in ("json", "ujson", "orjson"):
+        try:
+            codec = get_codec(name)
+        except ValueError:
+            print(f"{name:<8} not installed")
+            continue
+
+        loads = best_of(lambda: codec.loads(page), args.repeat)
+        dumps = best_of(lambda: codec.dumps(body), args.repeat)
+        escape = best_of(lambda: codec.escape(body["participants"]), args.repeat)
+        print(
+            f"{name:<8} page loads {loads * 1000:7.1f} ms"
+            f"   body dumps {dumps * 1000:7.1f} ms"
+            f"   csv escape {escape * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
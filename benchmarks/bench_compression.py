@@ -0,0 +1,62 @@
+"""
+Bytes on the wire for a full export and an upsert, with and without
+compression, against the local stand-in server.
+
+    python benchmarks/bench_compression.py --participants 20000
+
+requests asks for gzip responses by default, so "defaults" is how the SDK
+always sent and received; only compressing the upsert body
+(compress_requests_over) is new. "uncompressed" turns response
+compression off too (compress_responses=False), so its export is bigger
+than the SDK's has ever been; the export gap is what compression saves,
+not a gain over the earlier SDK.
+"""
+
+import argparse
+import time
+
+from signalvine_sdk.sdk import SignalVineSDK
+from stand_in_server import start_server
+from bench_upsert_body import make_frame
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--participants", type=int, default=20000)
+    args = parser.parse_args()
+
+    server = start_server(participants=args.participants)
+    hostname = f"http://127.0.0.1:{server.server_port}"
+    df = make_frame(args.participants)
+
+    for label, options in [
+        ("uncompressed", {"compress_responses": False}),
+        ("defaults", {}),
+        ("compressed", {"compress_requests_over": 64 * 1024}),
+    ]:
+        with SignalVineSDK(
+            "bench", "token", "secret", api_hostname=hostname, **options
+        ) as sdk:
+            server.state.bytes_sent = server.state.bytes_received = 0
+
+            start = time.perf_counter()
+            items = sdk.fetch_all_participants("bench", workers=4)
+            export_time = time.perf_counter() - start
+            assert len(items) == args.participants
+
+            start = time.perf_counter()
+            sdk.upsert_participants("bench", df)
+            upsert_time = time.perf_counter() - start
+
+        print(
+            f"{label:<13} export {server.state.bytes_sent / 2 ** 20:7.2f} MiB"
+            f" in {export_time:5.2f} s"
+            f"   upsert {server.state.bytes_received / 2 ** 20:7.2f} MiB"
+            f" in {upsert_time:5.2f} s"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Throughput of convert_participants_to_records against the previous
+Box-based conversion, and of participants_to_dataframe against building a
+DataFrame from records, on synthetic participants.
+
+    python benchmarks/bench_convert.py --participants 100000
+
+The Box-based conversion needs python-box, which the SDK doesn't any more
+(pip install python-box); without it that comparison is left out.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+try:
+    from box import Box
+except ImportError:
+    Box = None
+
+from signalvine_sdk.common import (
+    convert_participants_to_records,
+    participants_to_dataframe,
+)
+from stand_in_server import make_participant
+
+
+def convert_with_box(items, include_agg: bool = False):
+    # The conversion as it was before, for comparison.
+    new_list = []
+    for item in items:
+        record = {}
+        boxed_item = Box(item)
+        for profile in boxed_item.profile:
+            if profile.value:
+                record[f"{profile.name}"] = profile.value
+            else:
+                record[f"{profile.name}"] = None
+        if include_agg:
+            record["agg_receivedCount"] = boxed_item.receivedCount
+            record["agg_scheduledCount"] = boxed_item.scheduledCount
+            record["agg_sentCount"] = boxed_item.sentCount
+        new_list.append(record)
+    return new_list
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--participants", type=int, default=100000)
+    args = parser.parse_args()
+
+    items = [make_participant("bench", n) for n in range(args.participants)]
+
+    conversions = [("direct dict access", convert_participants_to_records)]
+    if Box is not None:
+        conversions.insert(0, ("Box-based", convert_with_box))
+    else:
+        print("Box-based            skipped, python-box isn't installed")
+
+    results = {}
+    for label, fn in conversions:
+        start = time.perf_counter()
+        results[label] = fn(items, include_agg=True)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20} {args.participants / elapsed:12,.0f} records/s")
+
+    if Box is not None:
+        assert results["Box-based"] == results["direct dict access"]
+    del results
+
+    for label, fn in [
+        (
+            "DataFrame of records",
+            lambda: pd.DataFrame(convert_participants_to_records(items, True)),
+        ),
+        ("columnar DataFrame", lambda: participants_to_dataframe(items, True)),
+    ]:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+
+        # tracemalloc slows Python code down, so peak memory is a second run
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{label:<20} {args.participants / elapsed:12,.0f} records/s"
+            f"   peak {peak / 2 ** 20:8.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
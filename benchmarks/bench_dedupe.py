@@ -0,0 +1,71 @@
+"""
+How long taking the duplicate phones out of an upsert-sized frame takes,
+against a phone index of participants already in the program, some of
+them with the rows' phones.
+
+    python benchmarks/bench_dedupe.py --rows 100000
+"""
+
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from signalvine_sdk.dedupe import dedupe_phones, make_phone_index
+from budget import add_budget_argument, check_budget
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    # Written the way people type them; every 1000th row repeats a phone.
+    return pd.DataFrame(
+        {
+            "phone": [
+                f"(303) 5{m // 10000:02d}-{m % 10000:04d}"
+                for m in (n - 1 if n % 1000 == 999 else n for n in range(rows))
+            ],
+            "customer_id": [f"cust-{n}" for n in range(rows)],
+        }
+    )
+
+
+def make_existing(rows: int) -> dict:
+    # Every other row is already in the program, every 500th under
+    # another customer id.
+    numbers = range(0, rows, 2)
+    return make_phone_index(
+        [f"+13035{n:06d}" for n in numbers],
+        [f"cust-{n}" if n % 500 else f"other-{n}" for n in numbers],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_budget_argument(parser, "deduping")
+    args = parser.parse_args()
+
+    # Not the warning about the rows taken out, once per repeat.
+    logging.getLogger("signalvine_sdk.dedupe").setLevel(logging.ERROR)
+
+    df = make_frame(args.rows)
+    existing = make_existing(args.rows)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        kept, report = dedupe_phones(df, "drop", existing)
+    elapsed = (time.perf_counter() - start) / args.repeat
+
+    print(
+        f"{args.rows} rows, {len(existing)} in program {elapsed * 1000:8.1f} ms"
+        f"   {len(kept)} kept, {len(report)} taken out"
+    )
+
+    check_budget(args, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+How long finding the changed rows and columns of an upsert-sized frame
+takes, against a snapshot of it with one column changed in 2% of rows,
+and how long fingerprinting the snapshot takes.
+
+    python benchmarks/bench_diff.py --rows 100000
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from signalvine_sdk.diff import cell_fingerprints, diff_records
+from budget import add_budget_argument, check_budget
+
+
+def make_frame(rows: int, fields: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "customer_id": [f"cust-{n}" for n in range(rows)],
+            **{
+                f"field{f}": [f"value{n % (f + 7)}" for n in range(rows)]
+                for f in range(fields)
+            },
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--fields", type=int, default=9)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_budget_argument(parser, "diffing")
+    args = parser.parse_args()
+
+    desired = make_frame(args.rows, args.fields)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        snapshot = cell_fingerprints(desired)
+    fingerprinting = (time.perf_counter() - start) / args.repeat
+
+    desired.loc[::50, "field3"] = "changed"
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        diff = diff_records(desired, snapshot)
+    diffing = (time.perf_counter() - start) / args.repeat
+
+    shape = f"{args.rows} rows x {len(desired.columns)} columns"
+    print(f"fingerprint {shape} {fingerprinting * 1000:8.1f} ms")
+    print(
+        f"diff        {shape} {diffing * 1000:8.1f} ms"
+        f"   {diff['changed'].sum()} changed, columns {diff['columns']}"
+    )
+
+    check_budget(args, diffing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+How long importing the SDK takes, in fresh interpreters, for the ways
+it's used: just the package, signing only, the client, and everything.
+Each figure is the median over --runs interpreters, and lists the heavy
+dependencies that got imported along the way.
+
+    python benchmarks/bench_import.py --runs 20
+
+--budget-ms is for a bare `import signalvine_sdk`, to catch eager imports
+creeping back in.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from budget import add_budget_argument, check_budget
+
+HEAVY = ["pandas", "requests", "aiohttp", "prometheus_client", "opentelemetry"]
+
+CASES = {
+    "import signalvine_sdk": "import signalvine_sdk",
+    "sign a request": (
+        "from signalvine_sdk import build_headers; "
+        "build_headers('token', 'secret', 'GET', '/v1/programs/p1', '')"
+    ),
+    "SignalVineSDK": "from signalvine_sdk import SignalVineSDK",
+    "everything": "from signalvine_sdk import *; participants_to_dataframe([])",
+    "(pandas alone)": "import pandas",
+}
+
+SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def time_import(code: str, runs: int):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(code=code, heavy=HEAVY)],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        elapsed, loaded = json.loads(out)
+        samples.append(elapsed)
+    return statistics.median(samples), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    add_budget_argument(parser, "import signalvine_sdk")
+    args = parser.parse_args()
+
+    results = {}
+    for label, code in CASES.items():
+        elapsed, loaded = time_import(code, args.runs)
+        results[label] = elapsed
+        print(f"{label:<24} {elapsed * 1000:8.1f} ms   {', '.join(loaded) or '-'}")
+
+    check_budget(args, results["import signalvine_sdk"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+What instrumentation costs per call: get_programs against the local
+stand-in server without any, with the do-nothing base class, and with the
+in-memory totals, then where the time went by phase.
+
+    python benchmarks/bench_instrumentation.py --calls 5000
+"""
+
+import argparse
+import time
+
+from signalvine_sdk.metrics import InMemoryInstrumentation, Instrumentation
+from signalvine_sdk.sdk import SignalVineSDK
+from stand_in_server import start_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    server = start_server()
+    hostname = f"http://127.0.0.1:{server.server_port}"
+    in_memory = InMemoryInstrumentation()
+
+    for label, instrumentation in [
+        ("none", None),
+        ("base class", Instrumentation()),
+        ("in memory", in_memory),
+    ]:
+        with SignalVineSDK(
+            "bench",
+            "token",
+            "secret",
+            api_hostname=hostname,
+            instrumentation=instrumentation,
+        ) as sdk:
+            sdk.get_programs()
+            in_memory.reset()
+
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                sdk.get_programs()
+            elapsed = time.perf_counter() - start
+
+        print(f"{label:<11} {elapsed / args.calls * 1e6:8.1f} us/call")
+
+    summary = in_memory.summary()["get_programs"]
+    for phase, seconds in sorted(summary["phases"].items(), key=lambda p: -p[1]):
+        print(f"  {phase:<9} {seconds / summary['calls'] * 1e6:8.1f} us/call")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+How long ParticipantStore takes to refresh from the stand-in server's
+participants, first empty and then with nothing changed, and to look
+participants up by phone and customer id.
+
+    python benchmarks/bench_store.py --participants 10000
+"""
+
+import argparse
+import time
+
+from signalvine_sdk.store import ParticipantStore
+from budget import add_budget_argument, check_budget
+from stand_in_server import make_participant
+
+
+class Participants:
+    """
+    Stands in for SignalVineSDK in refresh, without the HTTP.
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def iter_participants(self, program_id, chunk_size=500):
+        yield from self.items
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--participants", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    add_budget_argument(parser, "a phone lookup", unit="us")
+    args = parser.parse_args()
+
+    sdk = Participants([make_participant("bench", n) for n in range(args.participants)])
+    store = ParticipantStore("bench")
+
+    for label in ("refresh (empty)", "refresh (unchanged)"):
+        start = time.perf_counter()
+        counts = store.refresh(sdk)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20} {elapsed * 1000:10.1f} ms   {counts}")
+
+    numbers = range(0, args.participants, max(1, args.participants // args.lookups))
+    lookups = {
+        "by_phone": (
+            store.by_phone,
+            [f"(303) {n // 10000:03d}-{n % 10000:04d}" for n in numbers],
+        ),
+        "by_customer_id": (store.by_customer_id, [f"cust-{n:08d}" for n in numbers]),
+    }
+    results = {}
+    for label, (lookup, keys) in lookups.items():
+        start = time.perf_counter()
+        found = sum(len(lookup(key)) for key in keys)
+        elapsed = (time.perf_counter() - start) / len(keys)
+        results[label] = elapsed
+        print(f"{label:<20} {elapsed * 1e6:10.1f} us   {found} of {len(keys)} found")
+
+    store.close()
+
+    check_budget(args, results["by_phone"])
+
+
+if __name__ == "__main__":
+    main()
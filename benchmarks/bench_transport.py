@@ -0,0 +1,58 @@
+"""
+Per-request latency of one-off requests.get calls against the pooled
+session in SignalVineSDK, using the local stand-in server.
+
+    python benchmarks/bench_transport.py --requests 500
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from signalvine_sdk.common import build_headers
+from signalvine_sdk.sdk import SignalVineSDK
+from stand_in_server import start_server
+
+
+def timed(fn, n: int) -> list:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label: str, samples: list):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1000
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1000
+    print(f"{label:<28} p50 {p50:7.3f} ms   p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    server = start_server()
+    hostname = f"http://127.0.0.1:{server.server_port}"
+    path = "/v1/accounts/bench/programs"
+
+    def one_off():
+        # What every method used to do: a fresh connection per call.
+        headers = build_headers("token", "secret", "GET", path)
+        requests.get(f"{hostname}{path}?active=all", headers=headers).json()
+
+    report("requests.get per call", timed(one_off, args.requests))
+
+    with SignalVineSDK("bench", "token", "secret", api_hostname=hostname) as sdk:
+        report("pooled session", timed(sdk.get_programs, args.requests))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
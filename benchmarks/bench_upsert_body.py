@@ -0,0 +1,106 @@
+"""
+Cost of preparing an upsert request: the previous double serialization
+(json.dumps to sign, then requests re-encoding json=body), encoding once
+and signing and sending those bytes, and writing the body into a spool
+while signing it as it goes (what upsert_participants does now).
+
+Then the spooled body from rows that start out as dicts or as a pyarrow
+table: turned into a DataFrame first, or written straight from them.
+
+    python benchmarks/bench_upsert_body.py --rows 100000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+import requests
+
+from signalvine_sdk.body import SpooledBody, write_upsert_body
+from signalvine_sdk.common import build_headers, make_body
+
+PATH = "/v2/programs/bench/participants"
+URL = f"http://127.0.0.1{PATH}"
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "customer_id": [f"cust-{n:08d}" for n in range(rows)],
+            "first_name": [f"First{n}" for n in range(rows)],
+            "last_name": [f"Last{n}" for n in range(rows)],
+            "email": [f"person{n}@example.edu" for n in range(rows)],
+            "phone": [f"+1303{n:07d}" for n in range(rows)],
+            "group_list": ["Test Contacts;Another Group"] * rows,
+        }
+    )
+
+
+def encode_twice(body):
+    header_body = json.dumps(body, separators=(",", ":"), sort_keys=False)
+    headers = build_headers("token", "secret", "POST", PATH, header_body)
+    return requests.Request("POST", URL, json=body, headers=headers).prepare()
+
+
+def encode_once(body):
+    body_bytes = json.dumps(body, separators=(",", ":"), sort_keys=False).encode()
+    headers = build_headers("token", "secret", "POST", PATH, body_bytes)
+    return requests.Request("POST", URL, data=body_bytes, headers=headers).prepare()
+
+
+def spooled(records):
+    with SpooledBody("token", "secret", "POST", PATH, spool_threshold=2**20) as body:
+        write_upsert_body(body, "bench", records)
+        headers = body.build_headers()
+        return requests.Request(
+            "POST", URL, data=body.payload(), headers=headers
+        ).prepare()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    rows = df.to_dict("records")
+    print(f"{args.rows} rows")
+
+    cases = [
+        # These two start from the body dict, as make_body built it.
+        ("encode twice", lambda: encode_twice(make_body("bench", df))),
+        ("encode once", lambda: encode_once(make_body("bench", df))),
+        ("spooled", lambda: spooled(df)),
+        ("dicts, via pandas", lambda: spooled(pd.DataFrame(rows))),
+        ("dicts", lambda: spooled(rows)),
+    ]
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        cases += [
+            ("arrow, via pandas", lambda: spooled(table.to_pandas())),
+            ("arrow", lambda: spooled(table)),
+        ]
+    except ImportError:
+        pass
+
+    for label, fn in cases:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        elapsed = (time.perf_counter() - start) / args.repeat
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{label:<18} {elapsed * 1000:8.1f} ms   peak {peak / 2 ** 20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+How long pre-flight validation takes for an upsert-sized frame, against
+the stand-in server's program schema, with clean data and with a share
+of bad values.
+
+    python benchmarks/bench_validation.py --rows 100000
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from signalvine_sdk.validation import validate_records
+from budget import add_budget_argument, check_budget
+from stand_in_server import PROFILE_FIELDS, make_participant
+
+SCHEMA = dict(PROFILE_FIELDS)
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    # The stand-in's participants, as a frame of strings like a CSV gives.
+    items = (make_participant("bench", n)["profile"] for n in range(rows))
+    return pd.DataFrame([{p["name"]: p["value"] for p in profile} for profile in items])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_budget_argument(parser, "validating the clean frame")
+    args = parser.parse_args()
+
+    clean = make_frame(args.rows)
+    dirty = clean.copy()
+    dirty.loc[::100, "act"] = "lots"
+    dirty.loc[::250, "decision_date"] = "someday"
+    dirty.loc[::500, "honors"] = "maybe"
+
+    results = {}
+    for label, df in [("clean", clean), ("1% bad", dirty)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            problems = validate_records(df, SCHEMA)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        results[label] = elapsed
+
+        bad_rows = sum(len(p["rows"] or ()) for p in problems)
+        print(
+            f"{label:<7} {args.rows} rows x {len(df.columns)} columns"
+            f" {elapsed * 1000:8.1f} ms   {len(problems)} problems, {bad_rows} bad values"
+        )
+
+    check_budget(args, results["clean"])
+
+
+if __name__ == "__main__":
+    main()
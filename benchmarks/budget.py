@@ -0,0 +1,39 @@
+"""
+The time budget the benchmarks can be given, so a build can fail when
+something gets slower again: add_budget_argument adds --budget-ms (or
+--budget-us) to a benchmark's options, and check_budget exits with an
+error if a timing goes over it.
+"""
+
+import argparse
+import sys
+
+_PER_SECOND = {"ms": 1e3, "us": 1e6}
+
+
+def add_budget_argument(parser: argparse.ArgumentParser, what: str, unit: str = "ms"):
+    """
+    Add --budget-<unit>, the most what may take.
+    """
+    parser.add_argument(
+        f"--budget-{unit}",
+        dest="budget",
+        type=float,
+        default=None,
+        help=f"exit with an error if {what} takes longer than this many {unit}",
+    )
+    parser.set_defaults(budget_what=what, budget_unit=unit)
+
+
+def check_budget(args: argparse.Namespace, seconds: float):
+    """
+    Exit with an error if seconds is over the budget in args, if there is one.
+    """
+    if args.budget is None:
+        return
+    unit = args.budget_unit
+    took = seconds * _PER_SECOND[unit]
+    if took > args.budget:
+        sys.exit(
+            f"{args.budget_what} took {took:.1f} {unit}, over {args.budget} {unit}"
+        )
@@ -0,0 +1,253 @@
+"""
+End-to-end benchmarks of every SDK path against the local stand-in server,
+which runs in its own process.
+
+For each path it reports throughput (participants, rows or requests per
+second), p50/p99 latency of the HTTP requests it made, and peak traced
+memory (from a second run under tracemalloc).
+
+    python benchmarks/run_suite.py --participants 50000 --latency 0.02
+    python benchmarks/run_suite.py --only export
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import statistics
+import time
+import tracemalloc
+
+from signalvine_sdk.async_sdk import AsyncSignalVineSDK
+from signalvine_sdk.common import RetryPolicy, participants_to_dataframe
+from signalvine_sdk.sdk import SignalVineSDK
+from stand_in_server import spawn_server
+from bench_upsert_body import make_frame
+
+PROGRAM = "bench"
+
+
+def record_latencies(sdk: SignalVineSDK) -> list:
+    """
+    Time every request the client sends (to the response headers).
+    """
+    samples = []
+    send = sdk.session.request
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    sdk.session.request = timed
+    return samples
+
+
+def percentile(samples: list, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def make_cases(args) -> dict:
+    """
+    name -> (group, unit, function of the client returning how many units
+    it handled)
+    """
+    df = make_frame(args.rows)
+
+    def programs(sdk):
+        for _ in range(args.calls):
+            sdk.get_programs()
+        return args.calls
+
+    def schema(sdk):
+        for _ in range(args.calls):
+            sdk.get_program_schema(PROGRAM)
+        return args.calls
+
+    def pages(sdk):
+        count = 0
+        offset = 0
+        while True:
+            page = sdk.get_participants_chunk(PROGRAM, args.chunk_size, offset)
+            count += len(page)
+            if len(page) < args.chunk_size:
+                return count
+            offset += args.chunk_size
+
+    def iter_participants(sdk):
+        return sum(1 for _ in sdk.iter_participants(PROGRAM, args.chunk_size))
+
+    def streamed_pages(sdk):
+        count = 0
+        offset = 0
+        while True:
+            n = sum(
+                1 for _ in sdk.iter_participants_chunk(PROGRAM, args.chunk_size, offset)
+            )
+            count += n
+            if n < args.chunk_size:
+                return count
+            offset += args.chunk_size
+
+    def fetch_all(sdk):
+        return len(sdk.fetch_all_participants(PROGRAM, args.workers, args.chunk_size))
+
+    def to_dataframe(sdk):
+        return len(
+            participants_to_dataframe(sdk.iter_participants(PROGRAM, args.chunk_size))
+        )
+
+    def async_fetch_all(sdk):
+        async def run():
+            async with AsyncSignalVineSDK(
+                "bench", "token", "secret", api_hostname=sdk.api_hostname
+            ) as async_sdk:
+                return await async_sdk.fetch_all_participants(
+                    PROGRAM, args.workers, args.chunk_size
+                )
+
+        return len(asyncio.run(run()))
+
+    def upsert(sdk):
+        sdk.upsert_participants(PROGRAM, df)
+        return len(df)
+
+    def upsert_batched(sdk):
+        results = sdk.upsert_participants_batched(
+            PROGRAM, df, batch_size=args.batch_size, max_in_flight=args.workers
+        )
+        assert all(r["location"] for r in results)
+        return len(df)
+
+    def upsert_changes(sdk):
+        # What's there with 2% of it changed, against a fresh export.
+        desired = participants_to_dataframe(
+            sdk.iter_participants(PROGRAM, args.chunk_size)
+        )
+        desired.loc[::50, "first_name"] = "Changed"
+        result = sdk.upsert_changes(PROGRAM, desired)
+        assert result["changed"] == (len(desired) + 49) // 50
+        return len(desired)
+
+    def poll(sdk):
+        locations = [sdk.upsert_participants(PROGRAM, df.iloc[:1]) for _ in range(20)]
+        done = list(sdk.poll_locations(locations, interval=0.01, max_interval=0.1))
+        return len(done)
+
+    cases = {
+        "get_programs": ("misc", "requests", programs),
+        "get_program_schema": ("misc", "requests", schema),
+        "get_participants_chunk": ("export", "participants", pages),
+        "iter_participants_chunk": ("export", "participants", streamed_pages),
+        "iter_participants": ("export", "participants", iter_participants),
+        "fetch_all_participants": ("export", "participants", fetch_all),
+        "participants_to_dataframe": ("export", "participants", to_dataframe),
+        "upsert_participants": ("upsert", "rows", upsert),
+        "upsert_participants_batched": ("upsert", "rows", upsert_batched),
+        "upsert_changes": ("upsert", "rows", upsert_changes),
+        "poll_locations": ("upsert", "jobs", poll),
+    }
+    # The async client doesn't retry, so it can't get through injected errors.
+    if importlib.util.find_spec("aiohttp") is not None and not args.error_rate:
+        cases["async fetch_all_participants"] = (
+            "export",
+            "participants",
+            async_fetch_all,
+        )
+
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--participants", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=20000, help="rows to upsert")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--job-polls", type=int, default=3)
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the tracemalloc run"
+    )
+    parser.add_argument("--only", help="a group (misc, export, upsert) or a path name")
+    args = parser.parse_args()
+
+    process, url = spawn_server(
+        participants=args.participants,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        job_polls=args.job_polls,
+    )
+
+    def make_sdk():
+        return SignalVineSDK(
+            "bench",
+            "token",
+            "secret",
+            api_hostname=url,
+            pool_maxsize=args.workers,
+            retry_policy=RetryPolicy(max_attempts=5, backoff=0.01),
+        )
+
+    print(
+        f"{'path':<30} {'throughput':>22} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        f" {'peak MiB':>9}"
+    )
+
+    try:
+        for name, (group, unit, fn) in make_cases(args).items():
+            if args.only and args.only not in (group, name):
+                continue
+
+            with make_sdk() as sdk:
+                samples = record_latencies(sdk)
+                start = time.perf_counter()
+                try:
+                    units = fn(sdk)
+                except Exception as e:
+                    # Report it and go on to the next path.
+                    print(f"{name:<30} failed: {type(e).__name__}: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+
+            peak = float("nan")
+            if not args.no_memory:
+                with make_sdk() as sdk:
+                    tracemalloc.start()
+                    try:
+                        fn(sdk)
+                        _, peak = tracemalloc.get_traced_memory()
+                    except Exception as e:
+                        print(
+                            f"{name:<30} failed measuring memory: {type(e).__name__}: {e}"
+                        )
+                    finally:
+                        tracemalloc.stop()
+                    peak /= 2**20
+
+            if samples:
+                p50 = statistics.median(samples) * 1000
+                p99 = percentile(samples, 99) * 1000
+            else:
+                # not through the requests session
+                p50 = p99 = float("nan")
+
+            throughput = f"{units / elapsed:,.0f} {unit}/s"
+            print(
+                f"{name:<30} {throughput:>22} {len(samples):>9} {p50:8.2f} {p99:8.2f}"
+                f" {peak:9.1f}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+A local stand-in for the SignalVine API, for benchmarks.
+
+It answers the endpoints the SDK uses (programs, paged participants, v2
+upsert with 202 + Location, location status and program schema) with
+synthetic data, at whatever scale is asked for. It can add latency and
+fail a share of requests to exercise retries. It does not check
+signatures.
+
+    python benchmarks/stand_in_server.py --port 8765 --participants 200000 \
+        --latency 0.02 --error-rate 0.01
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_FIELDS = [
+    ("first_name", "String"),
+    ("last_name", "String"),
+    ("email", "String"),
+    ("phone", "String"),
+    ("customer_id", "String"),
+    ("group_list", "String"),
+    ("act", "Maybe (Numeric)"),
+    ("aspgpa", "Maybe (Float)"),
+    ("honors", "Maybe (Boolean)"),
+    ("decision_date", "Maybe (Date)"),
+]
+
+
+def make_participant(program_id: str, n: int) -> dict:
+    """
+    Build one synthetic participant in the shape of a type=full page item.
+    """
+    values = {
+        "first_name": f"First{n}",
+        "last_name": f"Last{n}",
+        "email": f"person{n}@example.edu",
+        "phone": f"+1303{n:07d}",
+        "customer_id": f"cust-{n:08d}",
+        "group_list": "Test Contacts",
+        "act": str(20 + n % 16) if n % 3 else "",
+        "aspgpa": f"{2 + (n % 200) / 100:.2f}",
+        "honors": "true" if n % 2 else "false",
+        "decision_date": "2021-03-01" if n % 5 else "",
+    }
+    profile = [
+        {
+            "name": name,
+            "type": sv_type,
+            "updated": "2020-10-28T14:36:57.831Z",
+            "sort": sort,
+            "value": values[name],
+        }
+        for sort, (name, sv_type) in enumerate(PROFILE_FIELDS)
+    ]
+    return {
+        "id": f"{n:08d}-0000-0000-0000-000000000000",
+        "customerId": values["customer_id"],
+        "programId": program_id,
+        "phone": values["phone"],
+        "active": True,
+        "groups": ["Test Contacts"],
+        "profile": profile,
+        "receivedCount": n % 7,
+        "scheduledCount": 0,
+        "sentCount": n % 11,
+    }
+
+
+@functools.lru_cache(maxsize=256)
+def make_page(program_id: str, offset: int, stop: int) -> bytes:
+    # Pages are cached so that building them doesn't dominate the benchmark.
+    items = [make_participant(program_id, n) for n in range(offset, stop)]
+    return json.dumps({"items": items}).encode()
+
+
+class StandInState:
+    """
+    Settings and counters shared by the request handlers.
+
+    Attributes:
+        participants -- participants in every program
+        latency, latency_jitter -- seconds added to every response, +/- jitter
+        error_rate -- share of requests that fail with error_status
+        retry_after -- Retry-After sent with those failures, if any
+        job_polls -- status checks before an upsert job reports complete
+    """
+
+    def __init__(
+        self,
+        participants: int = 1000,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        retry_after: str = None,
+        job_polls: int = 1,
+        seed: int = 0,
+    ):
+        self.participants = participants
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.job_polls = job_polls
+        self.random = random.Random(seed)
+
+        self.requests = 0
+        self.errors = 0
+        # bytes on the wire, bodies only
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # job id -> status checks left before it's complete
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def count(self, sent: int = 0, received: int = 0):
+        with self.lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.errors = 0
+            self.bytes_sent = self.bytes_received = 0
+
+    def next_request(self):
+        """
+        Count a request and decide how it goes: returns (delay, fail).
+        """
+        with self.lock:
+            self.requests += 1
+            delay = self.latency
+            if self.latency_jitter:
+                delay += self.random.uniform(-self.latency_jitter, self.latency_jitter)
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return max(delay, 0.0), fail
+
+    def next_job(self) -> int:
+        with self.lock:
+            job = len(self.jobs) + 1
+            self.jobs[job] = self.job_polls
+            return job
+
+    def poll_job(self, job: int) -> bool:
+        with self.lock:
+            left = self.jobs.get(job, 1) - 1
+            self.jobs[job] = left
+            return left <= 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients can keep connections alive
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; don't let Nagle hold them
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        LOGGER.debug(format, *args)
+
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+
+    def send_data(self, status: int, data: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", "") and len(data) > 1024:
+            data = gzip.compress(data, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.state.count(sent=len(data))
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status: int, payload, headers: dict = None):
+        self.send_data(status, json.dumps(payload).encode(), headers)
+
+    def injected(self) -> bool:
+        """
+        Apply the configured latency, and answer with an error if this
+        request is one of the failures. True if it was.
+        """
+        delay, fail = self.state.next_request()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            headers = {}
+            if self.state.retry_after is not None:
+                headers["Retry-After"] = self.state.retry_after
+            self.send_json(self.state.error_status, {"message": "injected"}, headers)
+        return fail
+
+    def do_GET(self):
+        if self.injected():
+            return
+
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        m = re.fullmatch(r"/v1/accounts/([^/]+)/programs", parts.path)
+        if m:
+            items = [
+                {
+                    "accountId": m.group(1),
+                    "active": True,
+                    "id": "program-1",
+                    "name": "One",
+                }
+            ]
+            return self.send_json(200, {"items": items})
+
+        m = re.fullmatch(r"/v1/programs/([^/]+)/participants", parts.path)
+        if m:
+            count = int(query.get("count", ["500"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            stop = max(min(offset + count, self.state.participants), offset)
+            return self.send_data(200, make_page(m.group(1), offset, stop))
+
+        m = re.fullmatch(r"/v1/programs/([^/]+)", parts.path)
+        if m and query.get("type") == ["schema"]:
+            fields = [{"name": name, "type": t} for name, t in PROFILE_FIELDS]
+            data = json.dumps({"fields": fields}).encode()
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            return self.send_data(200, data, {"ETag": etag})
+
+        m = re.fullmatch(r"/v2/programs/[^/]+/participants/jobs/(\d+)", parts.path)
+        if m:
+            complete = self.state.poll_job(int(m.group(1)))
+            return self.send_json(
+                200, {"complete": complete, "error": False, "message": ""}
+            )
+
+        self.send_json(404, {"message": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        self.state.count(received=len(data))
+
+        if self.injected():
+            return
+
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        json.loads(data)
+
+        m = re.fullmatch(r"/v2/programs/([^/]+)/participants", self.path)
+        if m:
+            location = f"{self.path}/jobs/{self.state.next_job()}"
+            return self.send_json(202, {}, {"Location": location})
+
+        self.send_json(404, {"message": "not found"})
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on prefetched pages they no longer want.
+        LOGGER.debug("Connection from %s dropped", client_address)
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **options):
+    """
+    Start the stand-in in a daemon thread of this process; options are
+    StandInState's. Returns the server; its base URL is
+    f"http://{host}:{server.server_port}", its counters are server.state.
+    """
+    server = StandInServer((host, port), StandInHandler)
+    server.state = StandInState(**options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def spawn_server(**options):
+    """
+    Start the stand-in in its own process, so it doesn't compete with the
+    client being measured for the GIL. Options are StandInState's.
+    Returns (process, base URL); terminate the process when done.
+    """
+    args = [sys.executable, __file__, "--port", "0"]
+    for name, value in options.items():
+        if value is not None:
+            args += [f"--{name.replace('_', '-')}", str(value)]
+
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().split()[-1]
+    return process, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", default=None)
+    parser.add_argument("--job-polls", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = vars(args)
+    host, port = options.pop("host"), options.pop("port")
+
+    server = StandInServer((host, port), StandInHandler)
+    server.state = StandInState(**options)
+    print(f"Serving on http://{host}:{server.server_port}", flush=True)
+    server.serve_forever()
@@ -42,11 +42,16 @@ setup(
         "Operating System :: OS Independent",
     ],
     packages=find_packages(where="src"),
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     package_dir={"": "src"},
     include_package_data=True,
     zip_safe=False,
     install_requires=install_requires,
+    extras_require={
+        "async": ["aiohttp"],
+        "prometheus": ["prometheus-client"],
+        "opentelemetry": ["opentelemetry-api"],
+    },
     url="https://github.com/CUBoulder-OIT/signalvine-sdk",
     setup_requires=["pytest-runner"],
     tests_require=["pytest"],
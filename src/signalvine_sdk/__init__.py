@@ -1,2 +1,77 @@
-from .common import *
-from .sdk import *
+import importlib
+
+# Public names and the modules they come from. A module is only imported
+# the first time one of its names is used, so signing a request doesn't
+# import requests, and nothing imports pandas until a DataFrame is needed.
+_EXPORTS = {
+    "common": [
+        "Error",
+        "APIError",
+        "ValidationError",
+        "DuplicatePhoneError",
+        "RetryPolicy",
+        "make_auth_headers",
+        "sign_request",
+        "build_headers",
+        "parse_location_status",
+        "iter_json_items",
+        "Records",
+        "iter_csv_chunks",
+        "make_body",
+        "convert_sv_types",
+        "convert_participant_to_record",
+        "convert_participants_to_records",
+        "participants_to_dataframe",
+    ],
+    "codec": ["JSONCodec", "OrjsonCodec", "UjsonCodec", "get_codec"],
+    "body": ["SpooledBody", "write_upsert_body"],
+    "ratelimit": ["TokenBucket", "FileTokenBucket"],
+    "metrics": [
+        "PHASES",
+        "RequestMetrics",
+        "Instrumentation",
+        "InMemoryInstrumentation",
+        "PrometheusInstrumentation",
+        "OpenTelemetryInstrumentation",
+    ],
+    "validation": [
+        "BUILTIN_COLUMNS",
+        "schema_rules",
+        "validate_records",
+        "raise_for_problems",
+    ],
+    "dedupe": [
+        "normalize_phone",
+        "normalize_phones",
+        "make_phone_index",
+        "find_duplicate_phones",
+        "dedupe_phones",
+    ],
+    "diff": ["cell_fingerprints", "diff_records", "merge_snapshot"],
+    "store": ["ParticipantStore"],
+    "sdk": ["SignalVineSDK"],
+    "async_sdk": ["AsyncSignalVineSDK"],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        # A submodule, as signalvine_sdk.sdk was before imports were lazy.
+        return importlib.import_module(f".{name}", __name__)
+
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Straight from the module's namespace from now on.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,393 @@
+import random
+import asyncio
+import logging
+import importlib.util
+from collections import deque
+from signalvine_sdk.common import (
+    APIError,
+    Records,
+    build_headers,
+    convert_sv_types,
+    make_body,
+    parse_location_status,
+)
+from signalvine_sdk.codec import JSONCodec, get_codec
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncSignalVineSDK:
+    """
+    The asyncio flavor of SignalVineSDK, on top of aiohttp.
+
+    Use it as an async context manager, or await close() when done, so the
+    pooled connections are released.
+    """
+
+    def __init__(
+        self,
+        account_number: str,
+        account_token: str,
+        account_secret: str,
+        api_hostname: str = "https://theseus-api.signalvine.com",
+        max_concurrency: int = 10,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+        session=None,
+        codec: Optional[JSONCodec] = None,
+    ):
+
+        # aiohttp is slow to import, so that waits until a session is made.
+        if session is None and importlib.util.find_spec("aiohttp") is None:
+            raise ImportError(
+                "AsyncSignalVineSDK needs aiohttp: pip install signalvine-sdk[async]"
+            )
+
+        # These are secrets that need to be set in the environment
+        self.account_number = account_number
+        self.account_token = account_token
+        self.account_secret = account_secret
+        assert self.account_secret, "Environment variables not set."
+
+        self.api_hostname = api_hostname
+
+        self.max_concurrency = max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+        # JSON goes through the fastest codec installed unless told otherwise.
+        self.codec = codec if codec is not None else get_codec()
+
+        # Both of these belong to an event loop, so they're made on first use
+        # inside the running loop rather than here. A session passed in is
+        # left open by close().
+        self.session = session
+        self._owns_session = session is None
+        self._semaphore = None
+
+    async def close(self):
+        """
+        Close the pooled connections held by the session, if it was made
+        here rather than passed in.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _get_session(self):
+        if self.session is None:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize, force_close=not self.keep_alive
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def _request(
+        self,
+        action: str,
+        path: str,
+        query: str = "",
+        body: Union[str, bytes] = "",
+        expected: Tuple[int, ...] = (200,),
+    ) -> Tuple[int, Dict, bytes]:
+        """
+        Sign and send a request through the shared session.
+
+        At most max_concurrency requests are out at once. Returns the
+        status, headers and the raw payload; raises APIError on an
+        unexpected status.
+        """
+        session = self._get_session()
+
+        headers = build_headers(
+            token=self.account_token,
+            secret=self.account_secret,
+            action=action,
+            path_no_query=path,
+            body=body,
+        )
+
+        url = f"{self.api_hostname}{path}{query}"
+
+        # Send the body exactly as it was signed.
+        data = body.encode() if isinstance(body, str) else body
+        data = data or None
+
+        async with self._semaphore:
+            async with session.request(action, url, headers=headers, data=data) as r:
+                payload = await r.read()
+                status, r_headers = r.status, r.headers
+
+        if status in expected:
+            return status, r_headers, payload
+        else:
+            raise APIError(status, f"API reason: {payload.decode(errors='replace')}")
+
+    async def get_programs(self, include_active: bool = True) -> List:
+        """
+        Get the program info for a specific account.
+        """
+        participant_path = f"/v1/accounts/{self.account_number}/programs"
+
+        query = ""
+        if include_active:
+            # To ensure we get a list of all programs, not just the active ones.
+            query = "?active=all"
+
+        _, _, payload = await self._request("GET", participant_path, query)
+
+        return self.codec.loads(payload)["items"]
+
+    async def get_participants_chunk(
+        self,
+        program_id: str,
+        chunk_size: int = 500,
+        offset: int = 0,
+        include_active: bool = True,
+    ) -> List:
+        """
+        Get one page of raw participants; see SignalVineSDK.get_participants_chunk.
+        """
+
+        participant_path = f"/v1/programs/{program_id}/participants"
+
+        query = f"?type=full&count={chunk_size}&offset={offset}"
+
+        if include_active:
+            # Otherwise we only get the active fields
+            query += "&active=all"
+
+        _, _, payload = await self._request("GET", participant_path, query)
+
+        return self.codec.loads(payload)["items"]
+
+    async def _iter_pages(
+        self,
+        program_id: str,
+        chunk_size: int,
+        in_flight: int,
+        include_active: bool,
+    ) -> AsyncIterator[List]:
+        """
+        Yield raw pages in offset order, keeping up to in_flight further
+        pages requested as tasks. Stops after the first short page.
+        """
+        in_flight = max(in_flight, 1)
+        pending = deque()
+        offset = 0
+
+        def submit_more():
+            nonlocal offset
+            while len(pending) < in_flight:
+                pending.append(
+                    asyncio.ensure_future(
+                        self.get_participants_chunk(
+                            program_id, chunk_size, offset, include_active
+                        )
+                    )
+                )
+                offset += chunk_size
+
+        try:
+            submit_more()
+            while True:
+                page = await pending.popleft()
+                if len(page) < chunk_size:
+                    yield page
+                    return
+                submit_more()
+                yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_participants(
+        self,
+        program_id: str,
+        chunk_size: int = 500,
+        prefetch: int = 2,
+        include_active: bool = True,
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield raw participants one at a time across every page, with the
+        next `prefetch` pages requested in the background.
+        """
+        pages = self._iter_pages(program_id, chunk_size, prefetch, include_active)
+        try:
+            async for page in pages:
+                for item in page:
+                    yield item
+        finally:
+            # Stop the prefetched pages now if the caller stopped early,
+            # rather than whenever the generator is garbage collected.
+            await pages.aclose()
+
+    async def fetch_all_participants(
+        self,
+        program_id: str,
+        workers: int = 8,
+        chunk_size: int = 500,
+        include_active: bool = True,
+    ) -> List:
+        """
+        Get every raw participant in a program, `workers` pages at a time,
+        keeping the first copy of each participant id.
+        """
+        participants = []
+        seen_ids = set()
+
+        async for page in self._iter_pages(
+            program_id, chunk_size, workers, include_active
+        ):
+            for item in page:
+                if item["id"] in seen_ids:
+                    continue
+                seen_ids.add(item["id"])
+                participants.append(item)
+
+        return participants
+
+    async def upsert_participants(
+        self,
+        program_id: str,
+        records_df: Records,
+        new_flag: str = "add",
+        mode_flag: str = "tx",
+        columns: Optional[List[str]] = None,
+        existing_columns: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Send the records for an upsert and return the Location path of the
+        job; see SignalVineSDK.upsert_participants.
+        """
+
+        participant_path = f"/v2/programs/{program_id}/participants"
+
+        body = make_body(
+            program_id=program_id,
+            content_df=records_df,
+            new_flag=new_flag,
+            mode_flag=mode_flag,
+            columns=columns,
+            existing_columns=existing_columns,
+        )
+
+        # Encode once; the signature is over these bytes and they're sent as is.
+        body_bytes = self.codec.dumps(body)
+
+        _, headers, _ = await self._request(
+            "POST", participant_path, body=body_bytes, expected=(202,)
+        )
+
+        return headers["Location"]
+
+    async def get_location_status(self, location_path: str) -> Tuple[bool, str]:
+        _, _, payload = await self._request("GET", location_path)
+
+        return parse_location_status(self.codec.loads(payload))
+
+    async def wait_for_location(
+        self,
+        location_path: str,
+        interval: float = 1.0,
+        max_interval: float = 30.0,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Poll an upsert Location until the job is complete and return its
+        error message, or None if it went through. The wait between polls
+        doubles up to max_interval.
+
+        Raises asyncio.TimeoutError if the job isn't done within timeout seconds.
+        """
+
+        async def poll():
+            delay = interval
+            while True:
+                complete, message = await self.get_location_status(location_path)
+                if complete:
+                    return message
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_interval)
+
+        return await asyncio.wait_for(poll(), timeout)
+
+    async def poll_locations(
+        self,
+        location_paths: Iterable[str],
+        interval: float = 1.0,
+        max_interval: float = 30.0,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Watch many upsert Locations at once and yield (location_path, message)
+        for each job as it completes; see SignalVineSDK.poll_locations. Each
+        job is polled by a task of its own, with at most max_concurrency
+        checks out at once.
+
+        Raises asyncio.TimeoutError if jobs are still running after timeout
+        seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        async def poll(path):
+            delay = interval
+            while True:
+                complete, message = await self.get_location_status(path)
+                if complete:
+                    return path, message
+                await asyncio.sleep(delay * random.uniform(1 - jitter, 1 + jitter))
+                delay = min(delay * backoff, max_interval)
+
+        pending = {asyncio.ensure_future(poll(path)) for path in set(location_paths)}
+        try:
+            while pending:
+                wait = None if deadline is None else max(deadline - loop.time(), 0)
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError(f"{len(pending)} jobs still running")
+                for task in done:
+                    yield task.result()
+        finally:
+            # Stop polling the rest if the caller stopped early, or on error.
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def get_program_schema(
+        self, program_id, convert_to_python_types=False
+    ) -> Dict:
+        """
+        Get the schema for the participant records as {name:type};
+        see SignalVineSDK.get_program_schema.
+        """
+
+        schema_path = f"/v1/programs/{program_id}"
+
+        # We build the headers off the path alone without query
+        _, _, payload = await self._request("GET", schema_path, "?type=schema")
+
+        # convert the fields to a dict
+        fields_dict = {}
+        for item in self.codec.loads(payload)["fields"]:
+            fields_dict[item["name"]] = item["type"]
+
+        if convert_to_python_types:
+            return convert_sv_types(fields_dict)
+        else:
+            return fields_dict
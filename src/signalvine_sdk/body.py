@@ -0,0 +1,190 @@
+import gzip
+import hmac
+import mmap
+import shutil
+import base64
+import hashlib
+import logging
+import tempfile
+from io import BytesIO
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from signalvine_sdk.codec import JSONCodec
+from signalvine_sdk.common import Records, iter_csv_chunks, make_auth_headers
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SpooledBody:
+    """
+    A request body that is written in pieces and signed as it goes.
+
+    The pieces are kept in memory up to spool_threshold bytes, then in a
+    temporary file, and the HMAC for the signature is updated with every
+    piece, so the whole body never has to be held or lowercased at once.
+    Use it as a context manager, or call close(), to let go of the spool.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        secret: str,
+        action: str,
+        path_no_query: str,
+        spool_threshold: int = 8 * 2**20,
+    ):
+        self.token = token
+        self.spool_threshold = spool_threshold
+        self.size = 0
+
+        # Everything in the string to sign up to the body; see sign_request.
+        self._hmac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._hmac.update(f"{token}\n{action}\n{path_no_query}\n".lower().encode())
+
+        self._spool = BytesIO()
+        self._payload = None
+        self.content_encoding = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data: bytes):
+        """
+        Add bytes to the body. They're signed lowercased byte by byte, so
+        they should be ASCII, as escaped JSON is.
+        """
+        if self._payload is not None or self.content_encoding is not None:
+            raise ValueError("Can't write to a body that's compressed or being sent")
+
+        if (
+            isinstance(self._spool, BytesIO)
+            and self.size + len(data) > self.spool_threshold
+        ):
+            spool = tempfile.TemporaryFile()
+            spool.write(self._spool.getbuffer())
+            self._spool = spool
+
+        self._spool.write(data)
+        self._hmac.update(data.lower())
+        self.size += len(data)
+
+    def build_headers(self) -> Dict:
+        """
+        Sign the body as of now. Each call gets a fresh date, so call it
+        again for every retry.
+        """
+        now_date = datetime.now(timezone.utc).isoformat()
+
+        # The body is already in the HMAC; only the date is left.
+        digest = self._hmac.copy()
+        digest.update(f"\n{now_date}".lower().encode())
+        auth_string = base64.b64encode(digest.digest()).decode()
+
+        headers = make_auth_headers(self.token, auth_string, now_date)
+        if self.content_encoding is not None:
+            headers["Content-Encoding"] = self.content_encoding
+
+        return headers
+
+    def compress(self, level: int = 6):
+        """
+        Gzip the spooled body for sending, a block at a time. The signature
+        stays over the uncompressed body, which is what the server gets
+        once it undoes the Content-Encoding. No more writes after this.
+        """
+        if self._payload is not None or self.content_encoding is not None:
+            raise ValueError("Can't compress a body that's compressed or being sent")
+
+        source = self._spool
+        # The compressed body is smaller, so it fits where the body did.
+        self._spool = (
+            BytesIO() if isinstance(source, BytesIO) else tempfile.TemporaryFile()
+        )
+
+        source.seek(0)
+        with gzip.GzipFile(
+            fileobj=self._spool, mode="wb", compresslevel=level, mtime=0
+        ) as gz:
+            shutil.copyfileobj(source, gz, 2**20)
+        source.close()
+
+        self.content_encoding = "gzip"
+
+    def payload(self):
+        """
+        The body for sending: the bytes when it's small enough to be in
+        memory, otherwise a read-only memory map of the spool file, which
+        is sent without being read into memory. No more writes after this.
+
+        Sending reads the memory map like a file, so it's rewound on every
+        call; call it again for every retry.
+        """
+        if self._payload is None:
+            if isinstance(self._spool, BytesIO):
+                self._payload = self._spool.getvalue()
+            else:
+                self._spool.flush()
+                self._payload = mmap.mmap(
+                    self._spool.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        if isinstance(self._payload, mmap.mmap):
+            self._payload.seek(0)
+        return self._payload
+
+    def close(self):
+        if isinstance(self._payload, mmap.mmap):
+            self._payload.close()
+        self._spool.close()
+
+
+def write_upsert_body(
+    body: SpooledBody,
+    program_id: str,
+    content_df: Records,
+    new_flag: str = "add",
+    mode_flag: str = "tx",
+    chunk_rows: int = 10000,
+    codec: Optional[JSONCodec] = None,
+    columns: Optional[List[str]] = None,
+    existing_columns: Optional[List[str]] = None,
+):
+    """
+    Write the same JSON as make_body, compactly encoded, into body without
+    building the whole CSV first: chunk_rows rows at a time are turned into
+    CSV, JSON-escaped and written. content_df, columns and existing_columns
+    are as for make_body; records other than DataFrames never go through
+    pandas.
+    """
+    if codec is None:
+        codec = JSONCodec()
+
+    columns, chunks = iter_csv_chunks(content_df, columns, chunk_rows)
+
+    if existing_columns is not None:
+        columns = list(existing_columns)
+    if not columns:
+        columns = "ignore"
+
+    head = {
+        "program": f"{program_id}",
+        "options": {
+            "new": new_flag,
+            "mode": mode_flag,
+            "existing": columns,
+            "absent": "ignore",
+        },
+    }
+
+    # Leave the object open and start the participants string.
+    body.write(codec.dumps(head)[:-1])
+    body.write(b',"participants":"')
+
+    for contents in chunks:
+        # JSON escapes character by character, so escaping the pieces is
+        # the same as escaping the whole.
+        body.write(codec.escape(contents))
+
+    body.write(b'"}')
@@ -0,0 +1,124 @@
+import json
+import logging
+from json.encoder import encode_basestring_ascii
+from typing import Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _needs_escaping(data: bytes) -> bool:
+    # The stdlib escapes everything past ASCII, and DEL; the fast encoders
+    # write those out as is.
+    return not data.isascii() or b"\x7f" in data
+
+
+class JSONCodec:
+    """
+    JSON encoding and decoding with the standard library.
+
+    dumps gives the compact, ASCII-only encoding that requests are signed
+    over (see sign_request), and the faster codecs below give the very
+    same bytes.
+    """
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, str]):
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def escape(self, text: str) -> bytes:
+        """
+        The JSON string encoding of text, without the surrounding quotes.
+        """
+        return encode_basestring_ascii(text)[1:-1].encode()
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    orjson, falling back on the standard library for anything with
+    non-ASCII text in it, which orjson can't escape.
+
+    The upsert bodies the SDK sends are strings and lists of strings; for
+    those the output is the same as JSONCodec's. Floats may be formatted
+    differently.
+    """
+
+    name = "orjson"
+
+    def loads(self, data: Union[bytes, str]):
+        return orjson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        data = orjson.dumps(obj)
+        if _needs_escaping(data):
+            return super().dumps(obj)
+        return data
+
+    def escape(self, text: str) -> bytes:
+        data = orjson.dumps(text)
+        if _needs_escaping(data):
+            return super().escape(text)
+        return data[1:-1]
+
+
+class UjsonCodec(JSONCodec):
+    """
+    ujson, falling back on the standard library for anything with
+    non-ASCII text in it, like OrjsonCodec.
+    """
+
+    name = "ujson"
+
+    def loads(self, data: Union[bytes, str]):
+        return ujson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        data = ujson.dumps(
+            obj, ensure_ascii=False, escape_forward_slashes=False
+        ).encode()
+        if _needs_escaping(data):
+            return super().dumps(obj)
+        return data
+
+    def escape(self, text: str) -> bytes:
+        data = ujson.dumps(
+            text, ensure_ascii=False, escape_forward_slashes=False
+        ).encode()
+        if _needs_escaping(data):
+            return super().escape(text)
+        return data[1:-1]
+
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """
+    The codec by name ('orjson', 'ujson' or 'json'), or by default the
+    fastest one installed.
+    """
+    available = {"json": JSONCodec}
+    if ujson is not None:
+        available["ujson"] = UjsonCodec
+    if orjson is not None:
+        available["orjson"] = OrjsonCodec
+
+    if name is None:
+        name = (
+            "orjson" if orjson is not None else "ujson" if ujson is not None else "json"
+        )
+
+    if name not in available:
+        raise ValueError(f"JSON codec {name!r} isn't available")
+
+    return available[name]()
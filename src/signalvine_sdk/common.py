@@ -1,15 +1,49 @@
+import io
+import os
+import re
+import sys
 import csv
 import hmac
+import json
+import codecs
 import hashlib
 import base64
 import logging
-import pandas as pd
-from typing import Dict, List
+import random
+import itertools
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 from datetime import datetime, timezone
-from box import Box
+from email.utils import parsedate_to_datetime
+
+if TYPE_CHECKING:
+    # pandas is only imported where it's used, as it's slow to import.
+    import pandas as pd
+    import pyarrow as pa
+
+# What upserts take as participant records: a pandas DataFrame, a pyarrow
+# Table or RecordBatch, the path of a CSV file, or an iterable of mappings
+# (such as dicts), one per row. See iter_csv_chunks.
+Records = Union[
+    "pd.DataFrame", "pa.Table", "pa.RecordBatch", str, "os.PathLike", Iterable[Mapping]
+]
 
 LOGGER = logging.getLogger(__name__)
 
+_NOT_WHITESPACE = re.compile(r"\S")
+
+# What can come right after a complete JSON value.
+_AFTER_VALUE = frozenset(",:]} \t\n\r")
+
 
 class Error(Exception):
     """Base class for other exceptions"""
@@ -30,17 +64,115 @@ class APIError(Error):
         self.message = message
 
 
+class ValidationError(Error):
+    """Exception raised when records don't fit the program schema, before
+    anything is sent.
+
+    Attributes:
+        problems -- what's wrong, as returned by validate_records
+        message -- text message of the error
+    """
+
+    def __init__(self, problems, message):
+        self.problems = problems
+        self.message = message
+        super().__init__(message)
+
+
+class DuplicatePhoneError(Error):
+    """Exception raised when records would clash on phone in SignalVine,
+    before anything is sent.
+
+    Attributes:
+        duplicates -- the clashing rows, as reported by dedupe_phones
+        message -- text message of the error
+    """
+
+    def __init__(self, duplicates, message):
+        self.duplicates = duplicates
+        self.message = message
+        super().__init__(message)
+
+
+class RetryPolicy:
+    """Which failed requests to try again, and how long to wait first.
+
+    Attributes:
+        max_attempts -- tries in total, counting the first; 1 turns retries off
+        status_codes -- HTTP status codes worth another try
+        backoff -- wait before the first retry, in seconds; doubles every retry
+        max_backoff -- longest wait, in seconds, Retry-After included
+        jitter -- fraction by which a wait is randomly stretched or shrunk
+        respect_retry_after -- wait as long as a Retry-After header asks
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        status_codes: Iterable[int] = (429, 500, 502, 503, 504),
+        backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        jitter: float = 0.1,
+        respect_retry_after: bool = True,
+    ):
+        self.max_attempts = max_attempts
+        self.status_codes = frozenset(status_codes)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.respect_retry_after = respect_retry_after
+
+    def should_retry(self, attempt: int, status_code: Optional[int] = None) -> bool:
+        """
+        Whether to go again after the given attempt (counting from 1) failed.
+        Leave status_code out when there was no response at all.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in self.status_codes
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Seconds to wait after the given attempt failed. retry_after is the
+        raw Retry-After header, either seconds or an HTTP date.
+        """
+        delay = self.backoff * 2 ** (attempt - 1)
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        if retry_after and self.respect_retry_after:
+            try:
+                asked = float(retry_after)
+            except ValueError:
+                try:
+                    asked = (
+                        parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)
+                    ).total_seconds()
+                except (TypeError, ValueError):
+                    asked = 0
+            delay = max(delay, asked)
+
+        return min(delay, self.max_backoff)
+
+
 def build_headers(
     token: str,
     secret: str,
     action: str = "GET",
     path_no_query: str = "",
-    body: str = "",
+    body: Union[str, bytes] = "",
 ) -> Dict:
 
     now_date = datetime.now(timezone.utc).isoformat()
 
     auth_string = sign_request(token, secret, now_date, action, path_no_query, body)
+
+    return make_auth_headers(token, auth_string, now_date)
+
+
+def make_auth_headers(token: str, auth_string: str, now_date: str) -> Dict:
+    """
+    The headers for a request signed with auth_string at now_date.
+    """
     auth_header = f"SignalVine {token}:{auth_string}"
     headers = {
         "Content-Type": "application/json",
@@ -57,13 +189,24 @@ def sign_request(
     timestamp: str,
     action: str,
     path_no_query: str,
-    body: str = "",
+    body: Union[str, bytes] = "",
 ) -> str:
     """
     Sign the request and return a bearer token for the SignalVine API
 
     Return a string with the encrypted request string
+
+    A bytes body is signed as the exact bytes that will be sent, lowercased
+    byte by byte. That matches signing the text as long as it's ASCII, which
+    json.dumps output is by default.
     """
+    if isinstance(body, bytes):
+        digest = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        digest.update(f"{token}\n{action}\n{path_no_query}\n".lower().encode())
+        digest.update(body.lower())
+        digest.update(f"\n{timestamp}".lower().encode())
+        return base64.b64encode(digest.digest()).decode()
+
     string_to_sign = f"{token}\n{action}\n{path_no_query}\n{body}\n{timestamp}".lower()
 
     digest = hmac.new(
@@ -74,26 +217,129 @@ def sign_request(
     return signature
 
 
+def parse_location_status(status_json: Dict) -> Tuple[bool, Optional[str]]:
+    """
+    Read the status document behind an upsert Location.
+
+    Returns (complete, message); message is only set for a finished job
+    that has an error.
+    """
+    if status_json["complete"] == True:
+        # only if this is complete do we care to sift through it.
+        if status_json["error"] == True:
+            return True, status_json["message"]
+        else:
+            return True, None
+    else:
+        # not complete; just say so
+        return False, None
+
+
+def iter_json_items(chunks: Iterable[bytes], key: str = "items") -> Iterator:
+    """
+    Yield the elements of the array under `key` in a top-level JSON object,
+    decoding them as the bytes come in, e.g. from Response.iter_content.
+
+    Only one element (plus a chunk) is held at a time, rather than the
+    whole document. Other top-level keys are parsed and skipped. Raises
+    KeyError if there's no such key, ValueError if the JSON is malformed.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos = "", 0
+
+    def fill() -> bool:
+        # Drop what's been parsed and add the next chunk.
+        nonlocal buf, pos
+        for chunk in chunks:
+            if chunk:
+                buf = buf[pos:] + text.decode(chunk)
+                pos = 0
+                return True
+        return False
+
+    def peek() -> str:
+        # Skip whitespace and return the next character without taking it.
+        nonlocal pos
+        while True:
+            m = _NOT_WHITESPACE.search(buf, pos)
+            if m:
+                pos = m.start()
+                return buf[pos]
+            pos = len(buf)
+            if not fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def take(expected: str) -> str:
+        nonlocal pos
+        char = peek()
+        if char not in expected:
+            raise ValueError(f"Expected one of {expected!r} in JSON, got {char!r}")
+        pos += 1
+        return char
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely cut off at the end of the chunk.
+                if not fill():
+                    raise
+                continue
+            # A number cut off by the chunk ("1500." or "1e-") decodes as a
+            # shorter one, so a value only counts once something that can
+            # follow a value does, or the data has run out.
+            if (end == len(buf) or buf[end] not in _AFTER_VALUE) and fill():
+                continue
+            pos = end
+            return obj
+
+    take("{")
+    if peek() == "}":
+        raise KeyError(key)
+
+    while True:
+        name = value()
+        take(":")
+        if name == key:
+            take("[")
+            if peek() == "]":
+                return
+            while True:
+                yield value()
+                if take(",]") == "]":
+                    return
+        else:
+            value()
+
+        if take(",}") == "}":
+            raise KeyError(key)
+
+
 def convert_participant_to_record(item, include_agg: bool = False) -> Dict:
     """
     Take the items from JSON and convert into a final data structure for analysis.
+
+    This reads the raw dicts directly; wrapping each item in a Box first
+    costs more than the conversion itself on large pages.
     """
     record = {}
-    boxed_item = Box(item)
 
-    for profile in boxed_item.profile:
+    for profile in item["profile"]:
         # These are a mix of custom and vendor-provided profile fields.
-        if profile.value:
-            record[f"{profile.name}"] = profile.value
-        else:
-            record[f"{profile.name}"] = None
+        # Empty values become None.
+        record[f"{profile['name']}"] = profile["value"] or None
 
     if include_agg:
         # Including these because these are handy to have, without
         # grabbing the entire message content and aggregating.
-        record["agg_receivedCount"] = boxed_item.receivedCount
-        record["agg_scheduledCount"] = boxed_item.scheduledCount
-        record["agg_sentCount"] = boxed_item.sentCount
+        record["agg_receivedCount"] = item["receivedCount"]
+        record["agg_scheduledCount"] = item["scheduledCount"]
+        record["agg_sentCount"] = item["sentCount"]
 
     return record
 
@@ -110,11 +356,214 @@ def convert_participants_to_records(items, include_agg: bool = False) -> List:
     return new_list
 
 
+def participants_to_dataframe(items, include_agg: bool = False) -> "pd.DataFrame":
+    """
+    Take the items from JSON and build a DataFrame, one row per participant.
+
+    Same rows and column order as a DataFrame of
+    convert_participants_to_records, but built column by column in one
+    pass over items, without a dict per row. Fields a participant doesn't
+    have come out as None. items can be any iterable, such as
+    SignalVineSDK.iter_participants.
+    """
+    import pandas as pd
+
+    columns = {}
+    row = 0
+
+    for item in items:
+        fields = [(f"{p['name']}", p["value"] or None) for p in item["profile"]]
+
+        if include_agg:
+            fields.append(("agg_receivedCount", item["receivedCount"]))
+            fields.append(("agg_scheduledCount", item["scheduledCount"]))
+            fields.append(("agg_sentCount", item["sentCount"]))
+
+        filled = 0
+        for name, value in fields:
+            column = columns.get(name)
+            if column is None:
+                # First time we see this field; earlier rows didn't have it.
+                column = columns[name] = [None] * row
+            if len(column) > row:
+                # Same name twice in one profile; the last one wins, like a dict.
+                column[row] = value
+            else:
+                column.append(value)
+                filled += 1
+
+        row += 1
+        if filled < len(columns):
+            # Pad the fields this participant doesn't have.
+            for column in columns.values():
+                if len(column) < row:
+                    column.append(None)
+
+    return pd.DataFrame(columns)
+
+
+def _is_instance(obj, module: str, *names: str) -> bool:
+    # Without importing the module: if it isn't imported, obj can't be one.
+    module = sys.modules.get(module)
+    return module is not None and isinstance(
+        obj, tuple(getattr(module, name) for name in names)
+    )
+
+
+def _write_csv_rows(
+    rows: Iterable, header: List, chunk_rows: Optional[int]
+) -> Iterator[str]:
+    """
+    CSV text of the header and rows (sequences of values), chunk_rows rows
+    a piece, written the way DataFrame.to_csv writes them (None is empty).
+    """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+
+    if chunk_rows is None:
+        writer.writerows(rows)
+    else:
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+
+    if out.tell() or chunk_rows is None:
+        yield out.getvalue()
+
+
+def iter_csv_chunks(
+    records: Records,
+    columns: Optional[List[str]] = None,
+    chunk_rows: Optional[int] = 10000,
+) -> Tuple[List, Iterator[str]]:
+    """
+    Get the columns of records, in order, and an iterator over their CSV
+    text, header line first, chunk_rows rows at a time (all at once if
+    None). The pieces join into what DataFrame.to_csv(index=False) would
+    give for the same rows.
+
+    records can be:
+        a pandas DataFrame
+        a pyarrow Table or RecordBatch
+        the path of a CSV file with a header line
+        an iterable of mappings (such as dicts), one per row
+
+    Only DataFrames need pandas; the rest are written straight to CSV as
+    they're read. columns picks and orders the columns; by default they're
+    the frame's, the table's, the file's header or the first mapping's
+    keys. A mapping missing some of the columns gets empty values for
+    them. Without columns, a later mapping with keys the first one didn't
+    have raises ValueError, rather than having them quietly left out.
+    """
+    if _is_instance(records, "pandas", "DataFrame"):
+        if columns is not None:
+            records = records[list(columns)]
+
+        def frame_chunks():
+            step = chunk_rows or max(len(records), 1)
+            # At least one pass, so that an empty frame still gets its header line.
+            for start in range(0, max(len(records), 1), step):
+                yield records.iloc[start : start + step].to_csv(
+                    index=False, header=start == 0, line_terminator="\n"
+                )
+
+        return records.columns.tolist(), frame_chunks()
+
+    if _is_instance(records, "pyarrow", "Table", "RecordBatch"):
+        pa = sys.modules["pyarrow"]
+        table = records
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if columns is not None:
+            table = table.select(list(columns))
+
+        def values(column) -> List:
+            # Through numpy is many times faster than to_pylist, for the
+            # types it gives the same values for: strings (nulls are None),
+            # and numbers and booleans without nulls (those would be NaN).
+            t = column.type
+            if pa.types.is_string(t) or (
+                column.null_count == 0
+                and (
+                    pa.types.is_integer(t)
+                    or pa.types.is_floating(t)
+                    or pa.types.is_boolean(t)
+                )
+            ):
+                return column.to_numpy(zero_copy_only=False).tolist()
+            return column.to_pylist()
+
+        def table_rows():
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                yield from zip(*(values(column) for column in batch.columns))
+
+        header = table.schema.names
+        return header, _write_csv_rows(table_rows(), header, chunk_rows)
+
+    if isinstance(records, (str, os.PathLike)):
+        path = records
+        # utf-8-sig drops the byte order mark Excel starts its UTF-8 CSVs
+        # with, which would otherwise end up in the first column's name.
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            header = next(csv.reader(f), [])
+
+        if columns is None:
+            columns = header
+        else:
+            columns = list(columns)
+            missing = [c for c in columns if c not in header]
+            if missing:
+                raise ValueError(f"Columns not in {path}: {missing}")
+        positions = [header.index(c) for c in columns]
+
+        def file_rows():
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                if positions == list(range(len(header))):
+                    yield from reader
+                else:
+                    for row in reader:
+                        yield [row[i] for i in positions]
+
+        return columns, _write_csv_rows(file_rows(), columns, chunk_rows)
+
+    rows = iter(records)
+    first = next(rows, None)
+    check_keys = columns is None
+    if columns is None:
+        columns = list(first) if first is not None else []
+    else:
+        columns = list(columns)
+    column_set = set(columns)
+
+    def mapping_rows():
+        if first is None:
+            return
+        for row in itertools.chain([first], rows):
+            if check_keys and not column_set.issuperset(row):
+                extra = [k for k in row if k not in column_set]
+                raise ValueError(f"Keys that aren't columns {columns}: {extra}")
+            yield [row.get(c) for c in columns]
+
+    return columns, _write_csv_rows(mapping_rows(), columns, chunk_rows)
+
+
 def make_body(
     program_id: str,
-    content_df: pd.DataFrame,
+    content_df: Records,
     new_flag: str = "add",
     mode_flag: str = "tx",
+    columns: Optional[List[str]] = None,
+    existing_columns: Optional[List[str]] = None,
 ):
     """
     From https://support.signalvine.com/hc/en-us/articles/360023207353-API-documentation
@@ -122,10 +571,16 @@ def make_body(
     new_flag can be 'add' or 'ignore'
     mode_flag can be 'tx' or 'row'
 
+    content_df can also be any of the other kinds of records that
+    iter_csv_chunks takes, and columns picks and orders the columns.
+    existing_columns limits the fields updated on participants that are
+    already in the program; by default it's every column sent.
     """
-    contents = content_df.to_csv(index=False, line_terminator="\n")
-    columns = content_df.columns.tolist()
+    columns, chunks = iter_csv_chunks(content_df, columns, chunk_rows=None)
+    contents = "".join(chunks)
 
+    if existing_columns is not None:
+        columns = list(existing_columns)
     if not columns:
         columns = "ignore"
 
@@ -150,7 +605,7 @@ def convert_sv_types(field_dict):
 
     new_dict = {}
     for k, v in field_dict.items():
-        print(k, v)
+        LOGGER.debug(f"{k}: {v}")
 
         if "Maybe" in v:
             required = False
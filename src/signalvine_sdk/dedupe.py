@@ -0,0 +1,235 @@
+import re
+import logging
+from signalvine_sdk.common import DuplicatePhoneError
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    # pandas is only imported where it's used, as it's slow to import.
+    import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+POLICIES = ("drop", "first", "raise")
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(value, country_code: str = "1") -> Optional[str]:
+    """
+    A phone number in the +<country code><number> form SignalVine uses,
+    whatever punctuation it was written with. Numbers starting with +
+    keep their country code; 10 digit numbers get country_code, and so do
+    11 digit ones that start with it. Anything else comes out as None, as
+    it can't be compared.
+    """
+    value = str(value)
+    digits = _NON_DIGITS.sub("", value)
+    if value.lstrip().startswith("+"):
+        return "+" + digits if digits else None
+    if len(digits) == 10:
+        return f"+{country_code}{digits}"
+    if len(digits) == 10 + len(country_code) and digits.startswith(country_code):
+        return "+" + digits
+    return None
+
+
+def normalize_phones(values: Iterable, country_code: str = "1") -> "pd.Series":
+    """
+    normalize_phone of each value, as a Series of str or None (for
+    missing values too).
+
+    One pass in plain Python; it's about twice as fast as the same steps
+    with the .str methods, which loop over the values once per step.
+    """
+    import pandas as pd
+
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values, dtype=object)
+    missing = values.isna().to_numpy()
+
+    return pd.Series(
+        [
+            None if m else normalize_phone(v, country_code)
+            for v, m in zip(values.to_numpy(), missing)
+        ],
+        index=values.index,
+        dtype=object,
+    )
+
+
+def make_phone_index(
+    phones: Iterable, customer_ids: Iterable, country_code: str = "1"
+) -> Dict[str, Optional[str]]:
+    """
+    {normalized phone: customer id (None if there isn't one)} for the
+    participants with these phones and customer ids. Phones that can't be
+    normalized are left out.
+    """
+    import pandas as pd
+
+    normalized = normalize_phones(phones, country_code)
+    return {
+        phone: None if pd.isna(customer_id) or customer_id == "" else str(customer_id)
+        for phone, customer_id in zip(normalized.tolist(), customer_ids)
+        if phone is not None
+    }
+
+
+def _clashes(
+    records_df: "pd.DataFrame",
+    existing: Optional[Mapping[str, Optional[str]]],
+    phone_column: str,
+    key_column: str,
+    country_code: str,
+) -> Dict:
+    """
+    The normalized phones and keys of the rows (None where there isn't
+    one), the existing customer ids their phones belong to, and boolean
+    arrays of which rows clash how, all numpy arrays by position; see
+    find_duplicate_phones.
+    """
+    import numpy as np
+    import pandas as pd
+
+    phones = normalize_phones(
+        pd.Series(records_df[phone_column].to_numpy(), dtype=object), country_code
+    )
+    valid = phones.notna().to_numpy()
+
+    keys = np.full(len(phones), None, dtype=object)
+    has_key = np.zeros(len(phones), dtype=bool)
+    if key_column in records_df.columns:
+        values = records_df[key_column].to_numpy(dtype=object)
+        has_key = pd.notna(values)
+        keys[has_key] = values[has_key].astype(str)
+
+    duplicate = phones.duplicated(keep=False).to_numpy() & valid
+    first = duplicate & ~phones.duplicated(keep="first").to_numpy()
+
+    phones = phones.to_numpy()
+    existing_ids = np.full(len(phones), None, dtype=object)
+    in_program = np.zeros(len(phones), dtype=bool)
+    if existing:
+        # A plain loop of dict lookups beats isin, which hashes every key.
+        known = np.fromiter(
+            (phone is not None and phone in existing for phone in phones),
+            dtype=bool,
+            count=len(phones),
+        )
+        existing_ids[known] = [existing[phone] for phone in phones[known]]
+        # Without a customer id on either side, there's nothing to tell
+        # them apart by, so it's taken to be that participant.
+        same = (existing_ids == keys) | ~has_key | pd.isna(existing_ids)
+        in_program = known & ~same
+
+    return {
+        "phone": phones,
+        "customer_id": keys,
+        "duplicate": duplicate,
+        "first": first,
+        "in_program": in_program,
+        "existing_customer_id": existing_ids,
+    }
+
+
+def find_duplicate_phones(
+    records_df: "pd.DataFrame",
+    existing: Optional[Mapping[str, Optional[str]]] = None,
+    phone_column: str = "phone",
+    key_column: str = "customer_id",
+    country_code: str = "1",
+) -> "pd.DataFrame":
+    """
+    Rows of records_df whose phone clashes with another one, as a frame
+    indexed like records_df with the columns:
+        phone -- the normalized phone
+        customer_id -- the row's key_column value, if it has one
+        duplicate -- True if another row of records_df has the same phone
+        first -- True for the first of those rows
+        in_program -- True if the phone belongs to a participant in
+            existing (a phone index, see make_phone_index) with another
+            customer id
+        existing_customer_id -- that participant's customer id
+
+    A row with the phone of a participant with the same customer id is
+    that participant, not a clash, and so is one where the row or the
+    participant has no customer id. Rows without a usable phone never
+    clash.
+    """
+    import pandas as pd
+
+    clashes = _clashes(records_df, existing, phone_column, key_column, country_code)
+    rows = clashes["duplicate"] | clashes["in_program"]
+
+    return pd.DataFrame(
+        {name: values[rows] for name, values in clashes.items()},
+        index=records_df.index[rows],
+    )
+
+
+def dedupe_phones(
+    records_df: "pd.DataFrame",
+    policy: str = "drop",
+    existing: Optional[Mapping[str, Optional[str]]] = None,
+    phone_column: str = "phone",
+    key_column: str = "customer_id",
+    country_code: str = "1",
+) -> Tuple["pd.DataFrame", List[Dict]]:
+    """
+    Take the rows out of records_df that would clash on phone in
+    SignalVine (see find_duplicate_phones), by policy:
+        drop -- every row sharing a phone with another row, and every row
+            with the phone of a different participant in existing
+        first -- the same, except the first of the rows sharing a phone
+            is kept (unless it clashes with existing)
+        raise -- raise DuplicatePhoneError if there are any
+
+    Returns the rows that are left and a report of the ones taken out,
+    one dict each in records_df order:
+        row -- its index label
+        phone -- the normalized phone
+        customer_id -- its key_column value, or None
+        reason -- "in program" or "duplicate"
+        existing_customer_id -- for "in program", the participant's
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+
+    clashes = _clashes(records_df, existing, phone_column, key_column, country_code)
+    in_program = clashes["in_program"]
+    duplicate = clashes["duplicate"]
+    if policy == "first":
+        duplicate = duplicate & ~clashes["first"]
+    taken = in_program | duplicate
+
+    def values(name):
+        return clashes[name][taken].tolist()
+
+    report = [
+        {
+            "row": row,
+            "phone": phone,
+            "customer_id": customer_id,
+            "reason": "in program" if clash_in_program else "duplicate",
+            "existing_customer_id": existing_id,
+        }
+        for row, phone, customer_id, clash_in_program, existing_id in zip(
+            records_df.index[taken],
+            values("phone"),
+            values("customer_id"),
+            in_program[taken],
+            values("existing_customer_id"),
+        )
+    ]
+
+    if report:
+        shown = ", ".join(f"{r['phone']} ({r['reason']})" for r in report[:5])
+        more = len(report) - 5
+        summary = f"{len(report)} rows clash on phone: {shown}" + (
+            f" and {more} more" if more > 0 else ""
+        )
+        if policy == "raise":
+            raise DuplicatePhoneError(report, summary)
+        LOGGER.warning(f"Dropped {summary}")
+
+    return records_df[~taken], report
@@ -0,0 +1,158 @@
+import logging
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    # pandas is only imported where it's used, as it's slow to import.
+    import numpy as np
+    import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+# Booleans as SignalVine writes them in an export.
+_BOOLEAN_TEXT = {"True": "true", "False": "false", "TRUE": "true", "FALSE": "false"}
+
+
+def _cell_text(values: "pd.Series") -> "np.ndarray":
+    # Values as the text they're sent as; missing ones are empty fields.
+    # Whole floats are written as integers, as integer columns with blanks
+    # in them are float columns in pandas, and booleans in lower case.
+    import pandas as pd
+    from pandas.api import types
+
+    missing = values.isna().to_numpy()
+    if types.is_float_dtype(values):
+        numbers = values.to_numpy()
+        whole = ~missing & (numbers % 1 == 0) & (abs(numbers) < 2**53)
+        text = values.astype(str).to_numpy(dtype=object)
+        text[whole] = numbers[whole].astype("int64").astype(str)
+    else:
+        text = values.astype(str).to_numpy(dtype=object)
+        if types.is_bool_dtype(values) or types.is_object_dtype(values):
+            lowered = pd.Series(text).map(_BOOLEAN_TEXT).to_numpy()
+            booleans = pd.notna(lowered)
+            text[booleans] = lowered[booleans]
+    text[missing] = ""
+    return text
+
+
+def cell_fingerprints(
+    records_df: "pd.DataFrame", key: str = "customer_id"
+) -> "pd.DataFrame":
+    """
+    A 64 bit hash of every cell of records_df but the key's, as a frame of
+    uint64 indexed by the key. Cells are hashed as the text they're sent
+    as, with missing values blank, whole floats as integers and booleans
+    in lower case, so 20, 20.0 and "20" hash the same, as do True, "True"
+    and "true", and a blank and None.
+
+    An export from SignalVine is all strings, so it only hashes like the
+    records it was made from where they're written the same way: other
+    floats are written as Python writes them, so 2.5 doesn't hash like an
+    exported "2.50".
+
+    Raises ValueError if key isn't a column, or a key is blank or repeated.
+    """
+    import pandas as pd
+
+    if key not in records_df.columns:
+        raise ValueError(f"The key column {key!r} isn't in the records")
+
+    keys = pd.Index(_cell_text(records_df[key]), name=key)
+    if (keys == "").any():
+        raise ValueError(f"Some records have no {key}")
+    if keys.has_duplicates:
+        shown = ", ".join(keys[keys.duplicated()].unique()[:5])
+        raise ValueError(f"Some records share a {key}: {shown}")
+
+    return pd.DataFrame(
+        {
+            column: pd.util.hash_array(_cell_text(records_df[column]))
+            for column in records_df.columns
+            if column != key
+        },
+        index=keys,
+    )
+
+
+def diff_records(
+    desired_df: "pd.DataFrame",
+    snapshot: Optional["pd.DataFrame"] = None,
+    key: str = "customer_id",
+) -> Dict:
+    """
+    Compare records with a snapshot of what SignalVine has (cell
+    fingerprints, as cell_fingerprints makes them), row by row.
+
+    Returns a dict:
+        new -- boolean array of the rows whose key isn't in the snapshot
+        changed -- boolean array of the other rows with any cell that
+            differs from the snapshot's, or isn't in it
+        columns -- the columns (not the key) that differ in any changed
+            row, in desired_df order
+        fingerprints -- desired_df's cell fingerprints, to merge into the
+            snapshot once they're sent (see merge_snapshot)
+
+    Without a snapshot every row is new.
+    """
+    import numpy as np
+
+    cells = cell_fingerprints(desired_df, key)
+    columns = list(cells.columns)
+
+    if snapshot is None:
+        positions = np.full(len(cells), -1)
+    else:
+        positions = snapshot.index.get_indexer(cells.index)
+    new = positions == -1
+    known = ~new
+
+    # Rows by cells; a column the snapshot doesn't have differs everywhere.
+    differs = np.ones((int(known.sum()), len(columns)), dtype=bool)
+    if snapshot is not None and known.any():
+        shared = [i for i, column in enumerate(columns) if column in snapshot.columns]
+        before = snapshot[[columns[i] for i in shared]].to_numpy()[positions[known]]
+        differs[:, shared] = cells.to_numpy()[known][:, shared] != before
+
+    changed = np.zeros(len(cells), dtype=bool)
+    changed[known] = differs.any(axis=1)
+
+    return {
+        "new": new,
+        "changed": changed,
+        "columns": [c for c, d in zip(columns, differs.any(axis=0)) if d],
+        "fingerprints": cells,
+    }
+
+
+def merge_snapshot(
+    snapshot: Optional["pd.DataFrame"], fingerprints: "pd.DataFrame"
+) -> "pd.DataFrame":
+    """
+    The snapshot once records with these cell fingerprints are upserted:
+    their cells replace the snapshot's, and new keys and columns are added.
+    Cells nobody sent, such as a new column for rows that weren't in the
+    records, are taken to be blank.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if snapshot is None:
+        return fingerprints.copy()
+
+    blank = pd.util.hash_array(np.array([""], dtype=object))[0]
+
+    keys = snapshot.index.append(
+        fingerprints.index[~fingerprints.index.isin(snapshot.index)]
+    )
+    columns = snapshot.columns.append(
+        fingerprints.columns.difference(snapshot.columns, sort=False)
+    )
+
+    # Built in numpy; reindexing with a fill value doesn't keep uint64 as is.
+    values = np.full((len(keys), len(columns)), blank, dtype=np.uint64)
+    values[: len(snapshot), : len(snapshot.columns)] = snapshot.to_numpy()
+    rows = keys.get_indexer(fingerprints.index)
+    cols = columns.get_indexer(fingerprints.columns)
+    values[rows[:, None], cols] = fingerprints.to_numpy()
+
+    return pd.DataFrame(values, index=keys, columns=columns)
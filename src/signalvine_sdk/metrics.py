@@ -0,0 +1,277 @@
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict
+
+LOGGER = logging.getLogger(__name__)
+
+# The phases a call's time is split into:
+#   wait -- rate limiting, and sleeping between retries
+#   serialize -- encoding (and compressing) the request body
+#   sign -- building the signed headers
+#   network -- sending the request and getting the response back
+#   parse -- decoding the JSON response
+#   convert -- turning decoded data into Python types
+PHASES = ("wait", "serialize", "sign", "network", "parse", "convert")
+
+
+class RequestMetrics:
+    """
+    What one SDK call did, handed to Instrumentation.on_request when it's
+    over, failed or not.
+
+    Attributes:
+        endpoint -- the SDK method, e.g. "get_participants_chunk"
+        action -- the HTTP method
+        status_code -- of the last response, or None if there wasn't one
+        retries -- attempts after the first
+        bytes_sent -- request body bytes, as sent (compressed if it was)
+        bytes_received -- response body bytes, per Content-Length when
+            given (so compressed if it was), or else as decoded
+        phases -- seconds spent in each phase it went through (see PHASES)
+        coalesced -- True if it shared another call's response rather than
+            sending its own request
+        cached -- True if it was answered from the SDK's cache, without a
+            request
+        error -- the exception it failed with, if it did
+        start_time -- wall clock time.time() it started at
+        duration -- seconds it took in all
+    """
+
+    __slots__ = (
+        "endpoint",
+        "action",
+        "status_code",
+        "retries",
+        "bytes_sent",
+        "bytes_received",
+        "phases",
+        "coalesced",
+        "cached",
+        "error",
+        "start_time",
+        "duration",
+        "_started",
+        "_instrumentation",
+    )
+
+    def __init__(self, endpoint: str, action: str, instrumentation: "Instrumentation"):
+        self.endpoint = endpoint
+        self.action = action
+        self.status_code = None
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phases = {}
+        self.coalesced = False
+        self.cached = False
+        self.error = None
+        self.start_time = None
+        self.duration = None
+        self._instrumentation = instrumentation
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def __enter__(self):
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._started
+        # GeneratorExit is a streaming call its caller stopped early, not a failure.
+        if isinstance(exc_value, Exception):
+            self.error = exc_value
+        try:
+            self._instrumentation.on_request(self)
+        except Exception:
+            # Metrics must never break the call they're about.
+            LOGGER.exception(f"Instrumentation failed on {self.endpoint}")
+
+
+class Instrumentation:
+    """
+    Receives the RequestMetrics of every SDK call. Pass one to
+    SignalVineSDK(instrumentation=...) and override on_request; this base
+    does nothing with them.
+
+    on_request is called on whichever thread made the call, so it should
+    be quick and safe to call from several threads at once. Without any
+    instrumentation the SDK doesn't time anything.
+    """
+
+    def on_request(self, metrics: RequestMetrics):
+        pass
+
+
+class InMemoryInstrumentation(Instrumentation):
+    """
+    Keeps running totals per endpoint, for a look at where time goes
+    without a metrics backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(Counter)
+        self._phases = defaultdict(Counter)
+
+    def on_request(self, metrics: RequestMetrics):
+        with self._lock:
+            totals = self._totals[metrics.endpoint]
+            totals["calls"] += 1
+            totals["errors"] += metrics.error is not None
+            totals["retries"] += metrics.retries
+            totals["bytes_sent"] += metrics.bytes_sent
+            totals["bytes_received"] += metrics.bytes_received
+            totals["seconds"] += metrics.duration
+            self._phases[metrics.endpoint].update(metrics.phases)
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        {endpoint: {calls, errors, retries, bytes_sent, bytes_received,
+        seconds, phases: {phase: seconds}}}
+        """
+        with self._lock:
+            return {
+                endpoint: dict(totals, phases=dict(self._phases[endpoint]))
+                for endpoint, totals in self._totals.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._phases.clear()
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Reports to prometheus_client counters and histograms, all labelled by
+    endpoint:
+        <namespace>_requests_total -- also by method and status (the
+            status code, "cached", or the exception name when there was no
+            response)
+        <namespace>_request_duration_seconds
+        <namespace>_phase_duration_seconds -- also by phase
+        <namespace>_retries_total
+        <namespace>_sent_bytes_total, <namespace>_received_bytes_total
+    """
+
+    def __init__(self, registry=None, namespace: str = "signalvine"):
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError(
+                "PrometheusInstrumentation needs prometheus_client: "
+                "pip install prometheus-client"
+            ) from None
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+
+        def make(kind, name, documentation, labels=("endpoint",)):
+            return kind(
+                name, documentation, labels, namespace=namespace, registry=registry
+            )
+
+        self.requests = make(
+            prometheus_client.Counter,
+            "requests_total",
+            "SDK calls made.",
+            ("endpoint", "method", "status"),
+        )
+        self.duration = make(
+            prometheus_client.Histogram,
+            "request_duration_seconds",
+            "Time SDK calls took.",
+        )
+        self.phase_duration = make(
+            prometheus_client.Histogram,
+            "phase_duration_seconds",
+            "Time SDK calls spent in each phase.",
+            ("endpoint", "phase"),
+        )
+        self.retries = make(
+            prometheus_client.Counter, "retries_total", "Requests retried."
+        )
+        self.sent_bytes = make(
+            prometheus_client.Counter, "sent_bytes_total", "Request body bytes sent."
+        )
+        self.received_bytes = make(
+            prometheus_client.Counter,
+            "received_bytes_total",
+            "Response body bytes received.",
+        )
+
+    def on_request(self, metrics: RequestMetrics):
+        endpoint = metrics.endpoint
+        if metrics.status_code is not None:
+            status = str(metrics.status_code)
+        elif metrics.cached:
+            status = "cached"
+        else:
+            status = type(metrics.error).__name__
+
+        self.requests.labels(endpoint, metrics.action, status).inc()
+        self.duration.labels(endpoint).observe(metrics.duration)
+        for phase, seconds in metrics.phases.items():
+            self.phase_duration.labels(endpoint, phase).observe(seconds)
+        if metrics.retries:
+            self.retries.labels(endpoint).inc(metrics.retries)
+        if metrics.bytes_sent:
+            self.sent_bytes.labels(endpoint).inc(metrics.bytes_sent)
+        if metrics.bytes_received:
+            self.received_bytes.labels(endpoint).inc(metrics.bytes_received)
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records a span per SDK call, named "signalvine <endpoint>", with the
+    HTTP method and status, bytes, retries and phase timings as attributes.
+    The span is made once the call is over, back-dated to when it started,
+    so it isn't the parent of anything made during the call.
+    """
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            if tracer is None:
+                raise ImportError(
+                    "OpenTelemetryInstrumentation needs a tracer or opentelemetry-api: "
+                    "pip install opentelemetry-api"
+                ) from None
+            trace = None
+
+        if tracer is None:
+            tracer = trace.get_tracer("signalvine_sdk")
+        self.tracer = tracer
+        self._error_status = (
+            None if trace is None else trace.Status(trace.StatusCode.ERROR)
+        )
+
+    def on_request(self, metrics: RequestMetrics):
+        attributes = {
+            "signalvine.endpoint": metrics.endpoint,
+            "http.request.method": metrics.action,
+            "signalvine.retries": metrics.retries,
+            "signalvine.bytes_sent": metrics.bytes_sent,
+            "signalvine.bytes_received": metrics.bytes_received,
+            "signalvine.coalesced": metrics.coalesced,
+            "signalvine.cached": metrics.cached,
+        }
+        if metrics.status_code is not None:
+            attributes["http.response.status_code"] = metrics.status_code
+        for phase, seconds in metrics.phases.items():
+            attributes[f"signalvine.phase.{phase}_seconds"] = seconds
+
+        start_ns = int(metrics.start_time * 1e9)
+        span = self.tracer.start_span(
+            f"signalvine {metrics.endpoint}", start_time=start_ns, attributes=attributes
+        )
+        if metrics.error is not None:
+            span.record_exception(metrics.error)
+            if self._error_status is not None:
+                span.set_status(self._error_status)
+        span.end(end_time=start_ns + int(metrics.duration * 1e9))
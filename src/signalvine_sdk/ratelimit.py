@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket rate limiter, safe to share between threads.
+
+    Attributes:
+        rate -- tokens added per second, i.e. the sustained requests/second
+        capacity -- most tokens the bucket holds, i.e. the largest burst;
+            rate by default, but at least 1 so a request can be let through
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"rate must be more than 0, not {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: float, tokens_now: float, elapsed: float):
+        """
+        Refill by elapsed seconds and try to take tokens.
+
+        Returns (tokens left, seconds to wait); the wait is 0 when the
+        tokens were taken.
+        """
+        tokens_now = min(self.capacity, tokens_now + elapsed * self.rate)
+        if tokens_now >= tokens:
+            return tokens_now - tokens, 0.0
+        return tokens_now, (tokens - tokens_now) / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens if they're there. Returns 0 if they were taken, or else
+        the seconds until they would be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._take(tokens, self._tokens, now - self._updated)
+            self._updated = now
+        return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until tokens can be taken. Returns the seconds spent waiting.
+        """
+        if tokens > self.capacity:
+            # The bucket never holds that many, so it would wait forever.
+            raise ValueError(
+                f"can't take {tokens} tokens from a bucket of {self.capacity}"
+            )
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket kept in a locked file, so it can be shared between
+    processes on the same machine (and the threads in each of them).
+
+    Every process using the same path draws from the same bucket.
+    """
+
+    def __init__(self, path: str, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self.path = path
+
+    @classmethod
+    def for_account(
+        cls,
+        account_number: str,
+        rate: float,
+        capacity: Optional[float] = None,
+        directory: Optional[str] = None,
+    ) -> "FileTokenBucket":
+        """
+        The bucket for a SignalVine account, in the temp directory unless
+        another is given.
+        """
+        directory = directory or tempfile.gettempdir()
+        path = os.path.join(directory, f"signalvine-{account_number}.bucket")
+        return cls(path, rate, capacity)
+
+    @contextmanager
+    def _locked_file(self):
+        with open(self.path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        # The file holds "<tokens> <wall clock time of last update>". The
+        # wall clock because monotonic clocks aren't comparable between
+        # processes.
+        with self._lock, self._locked_file() as f:
+            now = time.time()
+            f.seek(0)
+            try:
+                tokens_now, updated = (float(x) for x in f.read().split())
+            except ValueError:
+                # New or unreadable file; start full.
+                tokens_now, updated = self.capacity, now
+
+            tokens_now, wait = self._take(tokens, tokens_now, max(now - updated, 0.0))
+
+            f.seek(0)
+            f.truncate()
+            f.write(f"{tokens_now} {now}".encode())
+            f.flush()
+        return wait
@@ -1,20 +1,43 @@
-import pandas as pd
+import os
 import requests
 import logging
-import json
 import time
+import heapq
+import random
+import threading
+from collections import Counter, deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from signalvine_sdk.common import (
     APIError,
+    Records,
+    RetryPolicy,
     build_headers,
     convert_participants_to_records,
     convert_sv_types,
-    make_body,
+    iter_json_items,
+    parse_location_status,
+    participants_to_dataframe,
 )
-from typing import List, Dict, Optional, Tuple, Union
-from box import Box
+from signalvine_sdk.body import SpooledBody, write_upsert_body
+from signalvine_sdk.codec import JSONCodec, get_codec
+from signalvine_sdk.dedupe import dedupe_phones, make_phone_index
+from signalvine_sdk.diff import cell_fingerprints, diff_records, merge_snapshot
+from signalvine_sdk.metrics import Instrumentation, RequestMetrics
+from signalvine_sdk.ratelimit import TokenBucket
+from signalvine_sdk.validation import raise_for_problems, validate_records
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    # pandas is only imported where it's used, as it's slow to import.
+    import pandas as pd
 
 LOGGER = logging.getLogger(__name__)
 
+# Stands in for RequestMetrics when there's no instrumentation.
+_NOT_MEASURED = nullcontext()
+
 
 class SignalVineSDK:
     def __init__(
@@ -23,6 +46,21 @@ class SignalVineSDK:
         account_token: str,
         account_secret: str,
         api_hostname: str = "https://theseus-api.signalvine.com",
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+        session: Optional[requests.Session] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        request_timeout: Optional[Union[float, Tuple[float, float]]] = (10.0, 120.0),
+        rate_limiter: Optional[TokenBucket] = None,
+        schema_ttl: Optional[float] = 300.0,
+        phone_index_ttl: Optional[float] = 300.0,
+        coalesce_gets: bool = True,
+        spool_threshold: int = 8 * 2**20,
+        codec: Optional[JSONCodec] = None,
+        compress_responses: bool = True,
+        compress_requests_over: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
     ):
 
         # These are secrets that need to be set in the environment
@@ -33,28 +71,283 @@ class SignalVineSDK:
 
         self.api_hostname = api_hostname
 
+        # One session for every call, so the TCP/TLS handshake is paid once
+        # per pooled connection instead of once per request.
+        # pool_connections is the number of hosts to keep pools for,
+        # pool_maxsize the number of connections kept open per host.
+        # A session passed in is used as it is, and left open by close();
+        # these settings are only for the one made here.
+        self._owns_session = session is None
+        if self._owns_session:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            if not keep_alive:
+                session.headers["Connection"] = "close"
+
+            # requests asks for gzip or deflate responses already, and full
+            # participant pages compress very well; compress_responses=False
+            # is for when the CPU matters more than the bytes.
+            if not compress_responses:
+                session.headers["Accept-Encoding"] = "identity"
+
+        self.session = session
+
+        # Transient failures (throttling, 5xx, dropped connections) are
+        # retried; retry_counts tallies them by status code, or by exception
+        # name when there was no response.
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.retry_counts = Counter()
+        self._retry_lock = threading.Lock()
+
+        # Seconds to wait for a connection and then for the server to send
+        # something (one number for both), so a stalled connection fails
+        # and is retried instead of hanging; None waits for good.
+        self.request_timeout = request_timeout
+
+        # Every request, retries included, takes a token first. Pass the
+        # same limiter to every client on an account (a FileTokenBucket to
+        # share it between processes) to stay under the account's limit.
+        self.rate_limiter = rate_limiter
+
+        # Program schemas rarely change, so they're kept for schema_ttl
+        # seconds (None for good) and then revalidated with a conditional GET.
+        self.schema_ttl = schema_ttl
+        self._schema_cache = {}
+        self._schema_lock = threading.Lock()
+
+        # Deduping an upsert needs every phone in the program, which takes
+        # a full export, so the phones are kept for phone_index_ttl seconds
+        # (None for good), with the phones upserted since added in.
+        self.phone_index_ttl = phone_index_ttl
+        self._phone_indexes = {}
+        self._phone_index_lock = threading.Lock()
+
+        # What upsert_changes last sent, or found in SignalVine, per program
+        # and key, as cell fingerprints; see diff.py.
+        self._snapshots = {}
+        self._snapshot_lock = threading.Lock()
+
+        # Identical GETs made while one is already out wait for that one and
+        # share its response, rather than going out again.
+        self.coalesce_gets = coalesce_gets
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+        # Upsert bodies bigger than this many bytes are spooled to a
+        # temporary file rather than kept in memory.
+        self.spool_threshold = spool_threshold
+
+        # JSON goes through the fastest codec installed unless told otherwise.
+        self.codec = codec if codec is not None else get_codec()
+
+        # Upsert bodies of at least this many bytes are sent gzipped. Off
+        # unless set, since it needs the API to take Content-Encoding: gzip.
+        self.compress_requests_over = compress_requests_over
+
+        # Every call reports its RequestMetrics here, if set; see metrics.py.
+        self.instrumentation = instrumentation
+
+    def close(self):
+        """
+        Close the pooled connections held by the session, if it was made
+        here rather than passed in.
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _measure(self, endpoint: str, action: str):
+        """
+        A RequestMetrics to fill in during a call and report at the end of
+        it, used as a context manager; with no instrumentation, a stand-in
+        that gives None instead.
+        """
+        if self.instrumentation is None:
+            return _NOT_MEASURED
+        return RequestMetrics(endpoint, action, self.instrumentation)
+
+    def _loads(self, content: bytes, metrics: Optional[RequestMetrics] = None):
+        if metrics is None:
+            return self.codec.loads(content)
+        start = time.perf_counter()
+        data = self.codec.loads(content)
+        metrics.add("parse", time.perf_counter() - start)
+        return data
+
+    def _request(
+        self,
+        action: str,
+        path: str,
+        query: str = "",
+        body: Union[str, bytes, SpooledBody] = "",
+        expected: Tuple[int, ...] = (200,),
+        extra_headers: Optional[Dict] = None,
+        metrics: Optional[RequestMetrics] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a request with _send, coalescing identical concurrent GETs:
+        the first caller sends it, and everyone asking for the same path,
+        query and headers meanwhile gets the same response (or exception).
+        """
+        if not (self.coalesce_gets and action == "GET" and not kwargs.get("stream")):
+            return self._send(
+                action, path, query, body, expected, extra_headers, metrics, **kwargs
+            )
+
+        key = (path, query, expected, tuple(sorted((extra_headers or {}).items())))
+
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            if metrics is None:
+                return future.result()
+            metrics.coalesced = True
+            start = time.perf_counter()
+            try:
+                r = future.result()
+            finally:
+                metrics.add("network", time.perf_counter() - start)
+            metrics.status_code = r.status_code
+            return r
+
+        try:
+            r = self._send(
+                action, path, query, body, expected, extra_headers, metrics, **kwargs
+            )
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(r)
+            return r
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+
+    def _send(
+        self,
+        action: str,
+        path: str,
+        query: str = "",
+        body: Union[str, bytes, SpooledBody] = "",
+        expected: Tuple[int, ...] = (200,),
+        extra_headers: Optional[Dict] = None,
+        metrics: Optional[RequestMetrics] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Sign and send a request through the shared session.
+
+        The signature covers the path without the query string, and the
+        body exactly as given. Failures the retry policy allows are tried
+        again, re-signed each time since the signature includes the date.
+        Raises APIError on an unexpected status.
+
+        With metrics, the time spent in each phase of every attempt, the
+        retries and the bytes both ways are added to them.
+        """
+        url = f"{self.api_hostname}{path}{query}"
+        kwargs.setdefault("timeout", self.request_timeout)
+        attempt = 1
+
+        while True:
+            if self.rate_limiter is not None:
+                waited = self.rate_limiter.acquire()
+                if metrics is not None:
+                    metrics.add("wait", waited)
+
+            if metrics is not None:
+                start = time.perf_counter()
+
+            if isinstance(body, SpooledBody):
+                headers = body.build_headers()
+                kwargs["data"] = body.payload()
+            else:
+                headers = build_headers(
+                    token=self.account_token,
+                    secret=self.account_secret,
+                    action=action,
+                    path_no_query=path,
+                    body=body,
+                )
+            if extra_headers:
+                headers.update(extra_headers)
+
+            if metrics is not None:
+                sent = time.perf_counter()
+                metrics.add("sign", sent - start)
+                data = kwargs.get("data", body)
+                metrics.bytes_sent += len(
+                    data.encode() if isinstance(data, str) else data
+                )
+
+            try:
+                r = self.session.request(action, url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if metrics is not None:
+                    metrics.add("network", time.perf_counter() - sent)
+                if not self.retry_policy.should_retry(attempt):
+                    raise
+                reason, retry_after = type(e).__name__, None
+            else:
+                if metrics is not None:
+                    metrics.add("network", time.perf_counter() - sent)
+                    metrics.status_code = r.status_code
+                    length = r.headers.get("Content-Length")
+                    if length is not None:
+                        metrics.bytes_received += int(length)
+                    elif not kwargs.get("stream"):
+                        metrics.bytes_received += len(r.content)
+
+                if r.status_code in expected:
+                    return r
+                if not self.retry_policy.should_retry(attempt, r.status_code):
+                    raise APIError(r.status_code, f"API reason: {r.text}")
+                reason, retry_after = r.status_code, r.headers.get("Retry-After")
+
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            with self._retry_lock:
+                self.retry_counts[reason] += 1
+            LOGGER.warning(
+                f"{action} {path} failed ({reason}) on attempt {attempt}, "
+                f"retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            if metrics is not None:
+                metrics.retries += 1
+                metrics.add("wait", delay)
+            attempt += 1
+
     def get_programs(self, include_active: bool = True) -> List:
         """
         Get the program info for a specific account.
         """
         participant_path = f"/v1/accounts/{self.account_number}/programs"
 
-        headers = build_headers(
-            self.account_token, self.account_secret, "GET", participant_path
-        )
-
-        url = f"{self.api_hostname}{participant_path}"
-
+        query = ""
         if include_active:
             # To ensure we get a list of all programs, not just the active ones.
-            url += "?active=all"
+            query = "?active=all"
 
-        r = requests.get(url, headers=headers)
+        with self._measure("get_programs", "GET") as metrics:
+            r = self._request("GET", participant_path, query, metrics=metrics)
 
-        if r.status_code == 200:
-            return r.json()["items"]
-        else:
-            raise APIError(r.status_code, f"API reason: {r.text}")
+            return self._loads(r.content, metrics)["items"]
 
     def get_participants_chunk(
         self,
@@ -77,134 +370,782 @@ class SignalVineSDK:
 
         participant_path = f"/v1/programs/{program_id}/participants"
 
-        headers = build_headers(
-            self.account_token, self.account_secret, "GET", participant_path
-        )
+        query = f"?type=full&count={chunk_size}&offset={offset}"
+
+        if include_active:
+            # Otherwise we only get the active fields
+            query += "&active=all"
+
+        with self._measure("get_participants_chunk", "GET") as metrics:
+            r = self._request("GET", participant_path, query, metrics=metrics)
+
+            return self._loads(r.content, metrics)["items"]
+
+    def iter_participants_chunk(
+        self,
+        program_id: str,
+        chunk_size: int = 500,
+        offset: int = 0,
+        include_active: bool = True,
+        read_size: int = 64 * 1024,
+    ) -> Iterator[Dict]:
+        """
+        The streaming take on get_participants_chunk: the same page of raw
+        participants, yielded one by one as they're decoded from the
+        response, read_size bytes at a time. The first participant arrives
+        before the page is done downloading, and the page is never held in
+        memory as a whole.
+        """
+
+        participant_path = f"/v1/programs/{program_id}/participants"
 
-        url = f"{self.api_hostname}{participant_path}?type=full&count={chunk_size}&offset={offset}"
+        query = f"?type=full&count={chunk_size}&offset={offset}"
 
         if include_active:
             # Otherwise we only get the active fields
-            url += "&active=all"
+            query += "&active=all"
 
-        r = requests.get(url, headers=headers)
+        with self._measure("iter_participants_chunk", "GET") as metrics:
+            r = self._request(
+                "GET", participant_path, query, metrics=metrics, stream=True
+            )
 
-        if r.status_code == 200:
-            return r.json()["items"]
-        else:
-            raise APIError(r.status_code, f"API reason: {r.text}")
+            try:
+                items = iter_json_items(r.iter_content(read_size), "items")
+                if metrics is None:
+                    yield from items
+                    return
+
+                # Parse time here includes reading the body as it streams in.
+                while True:
+                    start = time.perf_counter()
+                    item = next(items, None)
+                    metrics.add("parse", time.perf_counter() - start)
+                    if item is None:
+                        return
+                    yield item
+            finally:
+                r.close()
+
+    def _iter_pages(
+        self,
+        program_id: str,
+        chunk_size: int,
+        in_flight: int,
+        include_active: bool,
+    ) -> Iterator[List]:
+        """
+        Yield raw pages in offset order, keeping up to in_flight further
+        pages requested in the background. Stops after the first short page.
+        """
+        if in_flight < 1:
+            offset = 0
+            while True:
+                page = self.get_participants_chunk(
+                    program_id, chunk_size, offset, include_active
+                )
+                yield page
+                if len(page) < chunk_size:
+                    return
+                offset += chunk_size
+
+        executor = ThreadPoolExecutor(max_workers=in_flight)
+        pending = deque()
+        offset = 0
+
+        def submit_more():
+            nonlocal offset
+            while len(pending) < in_flight:
+                pending.append(
+                    executor.submit(
+                        self.get_participants_chunk,
+                        program_id,
+                        chunk_size,
+                        offset,
+                        include_active,
+                    )
+                )
+                offset += chunk_size
+
+        try:
+            submit_more()
+            while True:
+                page = pending.popleft().result()
+                if len(page) < chunk_size:
+                    yield page
+                    return
+                # Top up before handing the page over, so the network keeps
+                # working while the caller does.
+                submit_more()
+                yield page
+        finally:
+            # Pages past the end, or left over when the caller stops early.
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_participants(
+        self,
+        program_id: str,
+        chunk_size: int = 500,
+        prefetch: int = 2,
+        include_active: bool = True,
+    ) -> Iterator[Dict]:
+        """
+        Yield raw participants one at a time across every page.
+
+        While the caller works through one page, the next `prefetch` pages
+        are fetched in the background, so at most prefetch + 1 pages are held
+        in memory. Set prefetch to 0 to fetch one page at a time.
+        """
+        for page in self._iter_pages(program_id, chunk_size, prefetch, include_active):
+            yield from page
+
+    def fetch_all_participants(
+        self,
+        program_id: str,
+        workers: int = 8,
+        chunk_size: int = 500,
+        include_active: bool = True,
+    ) -> List:
+        """
+        Get every raw participant in a program, with up to `workers` pages
+        requested at the same time.
+
+        Pages come back in offset order. Offsets can shift while we page
+        (people added or removed), so a participant may show up on two pages;
+        only the first copy is kept, going by the participant id.
+        """
+        participants = []
+        seen_ids = set()
+
+        for page in self._iter_pages(program_id, chunk_size, workers, include_active):
+            for item in page:
+                if item["id"] in seen_ids:
+                    continue
+                seen_ids.add(item["id"])
+                participants.append(item)
+
+        return participants
 
     def upsert_participants(
         self,
         program_id: str,
-        records_df: pd.DataFrame,
+        records_df: Records,
         new_flag: str = "add",
         mode_flag: str = "tx",
+        columns: Optional[List[str]] = None,
+        validate: bool = False,
+        dedupe: Optional[str] = None,
+        existing_columns: Optional[List[str]] = None,
     ):
         """
         From https://support.signalvine.com/hc/en-us/articles/360023207353-API-documentation
 
         It's on you to format the dates correctly in the dataframe.
 
-        Also, this drops duplicates. No quarter. It's mayhem in SV if a phone already exists.
+        records_df can also be a pyarrow Table, a CSV file path or an
+        iterable of dicts, which go straight into the body without pandas;
+        columns picks and orders the columns sent. See iter_csv_chunks.
+        existing_columns limits the fields updated on participants already
+        in the program (by default every column sent); see upsert_changes.
+
+        With validate, a DataFrame is checked against the program schema
+        first (see validate_participants), and ValidationError is raised
+        instead of sending it if anything doesn't fit.
+
+        Duplicate phones are mayhem in SV. With dedupe set to a policy
+        ("drop", "first" or "raise"), rows of a DataFrame sharing a phone, or
+        with the phone of another participant already in the program, are
+        dropped (and logged) or raise DuplicatePhoneError first; see
+        dedupe_participants.
 
         Mode is 'row' or 'tx'. In tx mode, it's all or nothing.
         """
 
-        # Drop the duplicates... TODO log duplicate numbers
-        # records_df = records_df.drop_duplicates(subset=["phone"], keep=False)
+        if dedupe is not None:
+            records_df, _ = self.dedupe_participants(program_id, records_df, dedupe)
+
+        if validate:
+            raise_for_problems(
+                self.validate_participants(program_id, records_df, columns)
+            )
 
         participant_path = f"/v2/programs/{program_id}/participants"
 
-        body = make_body(
-            program_id=program_id,
-            content_df=records_df,
-            new_flag=new_flag,
-            mode_flag=mode_flag,
-        )
+        # The body is encoded and signed in pieces as it's written to a
+        # spool, and the spooled bytes are what gets sent.
+        with self._measure("upsert_participants", "POST") as metrics, SpooledBody(
+            self.account_token,
+            self.account_secret,
+            "POST",
+            participant_path,
+            spool_threshold=self.spool_threshold,
+        ) as body:
+            if metrics is not None:
+                start = time.perf_counter()
 
-        header_body = json.dumps(body, separators=(",", ":"), sort_keys=False)
+            write_upsert_body(
+                body,
+                program_id=program_id,
+                content_df=records_df,
+                new_flag=new_flag,
+                mode_flag=mode_flag,
+                codec=self.codec,
+                columns=columns,
+                existing_columns=existing_columns,
+            )
 
-        headers = build_headers(
-            token=self.account_token,
-            secret=self.account_secret,
-            action="POST",
-            path_no_query=participant_path,
-            body=header_body,
-        )
+            if (
+                self.compress_requests_over is not None
+                and body.size >= self.compress_requests_over
+            ):
+                body.compress()
+
+            if metrics is not None:
+                metrics.add("serialize", time.perf_counter() - start)
 
-        url = f"{self.api_hostname}{participant_path}"
-        r = requests.post(url, json=body, headers=headers)
+            r = self._request(
+                "POST", participant_path, body=body, expected=(202,), metrics=metrics
+            )
 
         # Things get funky here. We're looking for a 202, and if so,
-        # get a Location from the headers, then GET that (in a loop?!)
-        # until we see "complete".
+        # get a Location from the headers, then GET that until we see
+        # "complete"; poll_locations and wait_for_location do that.
 
-        if r.status_code == 202:
-            # return the location path so we can orchestrate it outside of here.
-            location_path = r.headers["Location"]
-            return location_path
-        else:
-            raise APIError(r.status_code, f"API reason: {r.text}")
+        if dedupe is not None:
+            self._add_to_phone_index(program_id, records_df)
 
-    def get_location_status(self, location_path: str) -> Tuple[bool, str]:
-        url = f"{self.api_hostname}{location_path}"
+        # return the location path so we can orchestrate it outside of here.
+        location_path = r.headers["Location"]
+        return location_path
+
+    def upsert_participants_batched(
+        self,
+        program_id: str,
+        records_df: "pd.DataFrame",
+        batch_size: int = 1000,
+        max_in_flight: int = 4,
+        new_flag: str = "add",
+        mode_flag: str = "tx",
+        batches: Optional[Iterable[int]] = None,
+        validate: bool = False,
+        dedupe: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Upsert a large dataframe as several jobs of batch_size rows, with up
+        to max_in_flight batches being sent at the same time.
+
+        Returns one dict per batch, in batch order:
+            batch -- batch number
+            start, stop -- row positions of the batch in records_df
+            location -- Location path of the job, or None if it failed
+            status_code, error -- why it failed: the APIError details, or
+                no status code and the error if the request didn't get
+                through
+
+        A failed batch doesn't stop the others. To redo some of them, call
+        again with the same batch_size and batches set to their numbers.
+        In tx mode a bad row only rolls back its own batch.
+
+        With validate, the whole dataframe is checked against the program
+        schema before any batch is sent, and with dedupe it's deduped before
+        it's split into batches (so batch rows are positions in what's left);
+        see upsert_participants.
+        """
+        if dedupe is not None:
+            records_df, _ = self.dedupe_participants(program_id, records_df, dedupe)
+
+        if validate:
+            raise_for_problems(self.validate_participants(program_id, records_df))
+
+        if batches is None:
+            batches = range((len(records_df) + batch_size - 1) // batch_size)
+
+        def submit(batch: int) -> Dict:
+            start = batch * batch_size
+            stop = min(start + batch_size, len(records_df))
+            result = {
+                "batch": batch,
+                "start": start,
+                "stop": stop,
+                "location": None,
+                "status_code": None,
+                "error": None,
+            }
+
+            try:
+                result["location"] = self.upsert_participants(
+                    program_id,
+                    records_df.iloc[start:stop],
+                    new_flag=new_flag,
+                    mode_flag=mode_flag,
+                )
+            except APIError as e:
+                LOGGER.warning(f"Upsert of batch {batch} failed: {e.message}")
+                result["status_code"] = e.status_code
+                result["error"] = e.message
+            except requests.RequestException as e:
+                # Out of retries; the other batches' results still count.
+                LOGGER.warning(f"Upsert of batch {batch} failed: {e}")
+                result["error"] = f"{type(e).__name__}: {e}"
+            else:
+                if dedupe is not None:
+                    self._add_to_phone_index(program_id, records_df.iloc[start:stop])
+
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            return list(executor.map(submit, batches))
+
+    def upsert_changes(
+        self,
+        program_id: str,
+        desired_df: "pd.DataFrame",
+        key: str = "customer_id",
+        snapshot_path: Optional[str] = None,
+        refresh: bool = False,
+        new_flag: str = "add",
+        mode_flag: str = "tx",
+    ) -> Dict:
+        """
+        Upsert only the rows of desired_df that are new or differ from what
+        SignalVine has, rather than all of them, so the body and the job
+        scale with the changes rather than the program.
+
+        Rows are matched by key and compared cell by cell, by fingerprint
+        (see diff_records), with a snapshot of the program: the one kept
+        from the last upsert_changes, or loaded from snapshot_path, or else
+        (or with refresh) made from a full export. Only changed columns are
+        updated on existing participants; new ones get every column. Once
+        the job is accepted the snapshot takes in what was sent; it's saved
+        to snapshot_path, if given, either way. If the job then fails, call
+        invalidate_snapshot (or pass refresh next time).
+
+        Returns a dict:
+            location -- Location path of the job, or None if nothing changed
+            new, changed, unchanged -- how many rows were which
+            columns -- the columns updated on existing participants
+        """
+        import pandas as pd
 
-        headers = build_headers(
-            token=self.account_token,
-            secret=self.account_secret,
-            path_no_query=location_path,
+        if not isinstance(desired_df, pd.DataFrame):
+            raise TypeError(f"Only DataFrames can be diffed, not {type(desired_df)}")
+
+        snapshot = self._get_snapshot(program_id, key, snapshot_path, refresh)
+        diff = diff_records(desired_df, snapshot, key)
+        send = diff["new"] | diff["changed"]
+
+        result = {
+            "location": None,
+            "new": int(diff["new"].sum()),
+            "changed": int(diff["changed"].sum()),
+            "unchanged": int(len(desired_df) - send.sum()),
+            "columns": diff["columns"],
+        }
+        LOGGER.info(
+            f"Upserting changes to {program_id}: {result['new']} new, "
+            f"{result['changed']} changed, {result['unchanged']} unchanged"
         )
+        if send.any():
+            # Unchanged columns only need sending for new participants.
+            columns = None if diff["new"].any() else [key] + diff["columns"]
+            result["location"] = self.upsert_participants(
+                program_id,
+                desired_df[send],
+                new_flag=new_flag,
+                mode_flag=mode_flag,
+                columns=columns,
+                existing_columns=diff["columns"],
+            )
+
+            snapshot = merge_snapshot(snapshot, diff["fingerprints"][send])
+            with self._snapshot_lock:
+                self._snapshots[(program_id, key)] = snapshot
+
+        if snapshot_path is not None:
+            snapshot.to_pickle(snapshot_path)
+
+        return result
+
+    def _get_snapshot(
+        self, program_id: str, key: str, snapshot_path: Optional[str], refresh: bool
+    ) -> "pd.DataFrame":
+        """
+        The snapshot upsert_changes compares with: the one in memory, or
+        the one at snapshot_path, or fingerprints of a full export.
+        """
+        import pandas as pd
+
+        if not refresh:
+            with self._snapshot_lock:
+                snapshot = self._snapshots.get((program_id, key))
+            if snapshot is not None:
+                return snapshot
 
-        r = requests.get(url, headers=headers)
-        if r.status_code == 200:
-            status_json = r.json()
-            if status_json["complete"] == True:
-                # only if this is complete do we care to sift through it.
-                if status_json["error"] == True:
-                    return True, status_json["message"]
-                else:
-                    return True, None
+        snapshot = None
+        if not refresh and snapshot_path is not None and os.path.exists(snapshot_path):
+            snapshot = pd.read_pickle(snapshot_path)
+            # One made with another key can't be matched up.
+            if snapshot.index.name != key:
+                LOGGER.warning(
+                    f"Ignoring {snapshot_path}, a snapshot by {snapshot.index.name}"
+                )
+                snapshot = None
+
+        if snapshot is None:
+            export = participants_to_dataframe(self.iter_participants(program_id))
+            if key in export.columns:
+                # Participants without the key can't be matched; ones that
+                # showed up twice while paging are the same participant.
+                export = export[export[key].notna() & (export[key] != "")]
+                export = export.drop_duplicates(subset=[key], keep="last")
             else:
-                # not complete; just say so
-                return False, None
-        else:
-            raise APIError(r.status_code, f"API reason: {r.text}")
+                export = pd.DataFrame({key: []})
+            snapshot = cell_fingerprints(export, key)
 
-    def get_program_schema(self, program_id, convert_to_python_types=False) -> Dict:
+        with self._snapshot_lock:
+            self._snapshots[(program_id, key)] = snapshot
+        return snapshot
+
+    def invalidate_snapshot(self, program_id: Optional[str] = None):
         """
-        Get the schema for the participant records
-        Return it as a dictionary in the form {name:type}.
-        Type is still the SignalVine type.
+        Drop the snapshots upsert_changes keeps for a program, or for all of
+        them if no program_id is given, so the next one exports the program
+        (or loads its snapshot_path) again.
+        """
+        with self._snapshot_lock:
+            if program_id is None:
+                self._snapshots.clear()
+            else:
+                for key in [k for k in self._snapshots if k[0] == program_id]:
+                    del self._snapshots[key]
 
-        Set convert_to_python_types to True to return Python primative types instead
+    def validate_participants(
+        self,
+        program_id: str,
+        records_df: "pd.DataFrame",
+        columns: Optional[List[str]] = None,
+    ) -> List[Dict]:
         """
+        Check records against the program's (cached) schema before
+        upserting them: unknown columns, blanks in fields that aren't Maybe,
+        and values that can't be taken as the field's Boolean, Numeric,
+        Float or Date type. Returns the problems, with the failing rows by
+        index; empty if there are none. See validate_records.
 
-        schema_path = f"/v1/programs/{program_id}"
+        Only DataFrames can be checked; columns limits it to those columns.
+        """
+        import pandas as pd
 
-        # We build the headers off the path alone without query
-        headers = build_headers(
-            self.account_token, self.account_secret, "GET", schema_path
+        if not isinstance(records_df, pd.DataFrame):
+            raise TypeError(f"Only DataFrames can be validated, not {type(records_df)}")
+        if columns is not None:
+            records_df = records_df[list(columns)]
+
+        return validate_records(records_df, self.get_program_schema(program_id))
+
+    def dedupe_participants(
+        self,
+        program_id: str,
+        records_df: "pd.DataFrame",
+        policy: str = "drop",
+        country_code: str = "1",
+    ) -> Tuple["pd.DataFrame", List[Dict]]:
+        """
+        Take out the rows that would clash on phone once upserted: rows
+        sharing a phone with another row, and rows with the phone of a
+        participant in the program (per the cached phone index, see
+        get_phone_index) under another customer id. policy is "drop" (all
+        of them), "first" (keep the first of rows sharing a phone) or
+        "raise" (DuplicatePhoneError if there are any).
+
+        Returns the rows left and a report of the ones taken out; see
+        dedupe_phones. Only DataFrames can be deduped.
+        """
+        import pandas as pd
+
+        if not isinstance(records_df, pd.DataFrame):
+            raise TypeError(f"Only DataFrames can be deduped, not {type(records_df)}")
+
+        return dedupe_phones(
+            records_df,
+            policy,
+            existing=self.get_phone_index(program_id, country_code=country_code),
+            country_code=country_code,
         )
 
-        url = f"{self.api_hostname}{schema_path}"
+    def get_location_status(self, location_path: str) -> Tuple[bool, str]:
+        with self._measure("get_location_status", "GET") as metrics:
+            r = self._request("GET", location_path, metrics=metrics)
+
+            return parse_location_status(self._loads(r.content, metrics))
+
+    def poll_locations(
+        self,
+        location_paths: Iterable[str],
+        interval: float = 1.0,
+        max_interval: float = 30.0,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+        timeout: Optional[float] = None,
+        max_workers: int = 4,
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Watch many upsert Locations at once and yield (location_path, message)
+        for each job as it completes, in completion order. message is the
+        job's error, or None if it went through.
+
+        Every job is checked right away, then again after interval seconds,
+        with the wait multiplied by backoff after every check up to
+        max_interval. Each wait is randomly stretched or shrunk by up to
+        jitter (a fraction) so that jobs don't get polled in lockstep.
+        Checks that are due together run on max_workers threads.
+
+        Raises TimeoutError if jobs are still running after timeout seconds.
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        # (when to check next, location path, wait after this check)
+        schedule = [(start, path, interval) for path in set(location_paths)]
+        heapq.heapify(schedule)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while schedule:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise TimeoutError(f"{len(schedule)} jobs still running")
+
+                due = []
+                while schedule and schedule[0][0] <= now:
+                    due.append(heapq.heappop(schedule))
+
+                if not due:
+                    wait = schedule[0][0] - now
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    time.sleep(wait)
+                    continue
+
+                futures = {
+                    executor.submit(self.get_location_status, path): (path, delay)
+                    for _, path, delay in due
+                }
+
+                for future in as_completed(futures):
+                    path, delay = futures[future]
+                    complete, message = future.result()
+                    if complete:
+                        yield path, message
+                    else:
+                        wait = delay * random.uniform(1 - jitter, 1 + jitter)
+                        heapq.heappush(
+                            schedule,
+                            (
+                                time.monotonic() + wait,
+                                path,
+                                min(delay * backoff, max_interval),
+                            ),
+                        )
+
+    def wait_for_location(
+        self,
+        location_path: str,
+        interval: float = 1.0,
+        max_interval: float = 30.0,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Poll one upsert Location until the job is complete and return its
+        error message, or None if it went through. See poll_locations.
+        """
+        for _, message in self.poll_locations(
+            [location_path], interval, max_interval, timeout=timeout
+        ):
+            return message
 
-        # We could also just tack these to the end of the url
-        params = {"type": "schema"}
+    def _fetch_program_schema(
+        self,
+        program_id: str,
+        stale: Optional[Dict],
+        metrics: Optional[RequestMetrics] = None,
+    ) -> Dict:
+        """
+        Fetch a program schema into a cache entry. With a stale entry, ask
+        the server whether it changed first (ETag/Last-Modified), and keep
+        the entry as is if it didn't.
+        """
+        schema_path = f"/v1/programs/{program_id}"
 
-        r = requests.get(url, params=params, headers=headers)
+        extra_headers = {}
+        if stale is not None:
+            if stale["etag"]:
+                extra_headers["If-None-Match"] = stale["etag"]
+            if stale["last_modified"]:
+                extra_headers["If-Modified-Since"] = stale["last_modified"]
 
-        if r.status_code == 200:
+        # We build the headers off the path alone without query
+        r = self._request(
+            "GET",
+            schema_path,
+            "?type=schema",
+            expected=(200, 304),
+            extra_headers=extra_headers,
+            metrics=metrics,
+        )
 
+        if r.status_code == 304 and stale is not None:
+            entry = dict(stale)
+        else:
             # convert the fields to a dict
             fields_dict = {}
-            for item in r.json()["fields"]:
+            for item in self._loads(r.content, metrics)["fields"]:
                 fields_dict[item["name"]] = item["type"]
 
+            entry = {
+                "raw": fields_dict,
+                # made from raw the first time it's asked for
+                "converted": None,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+
+        entry["expires"] = (
+            None if self.schema_ttl is None else time.monotonic() + self.schema_ttl
+        )
+        return entry
+
+    def get_program_schema(
+        self, program_id, convert_to_python_types=False, refresh=False
+    ) -> Dict:
+        """
+        Get the schema for the participant records
+        Return it as a dictionary in the form {name:type}.
+        Type is still the SignalVine type.
+
+        Set convert_to_python_types to True to return Python primative types instead
+
+        Schemas are cached for schema_ttl seconds; set refresh to True to
+        fetch it again regardless.
+        """
+
+        with self._measure("get_program_schema", "GET") as metrics:
+            with self._schema_lock:
+                entry = self._schema_cache.get(program_id)
+
+            if (
+                entry is None
+                or refresh
+                or (
+                    entry["expires"] is not None
+                    and time.monotonic() >= entry["expires"]
+                )
+            ):
+                entry = self._fetch_program_schema(
+                    program_id, None if refresh else entry, metrics
+                )
+                with self._schema_lock:
+                    self._schema_cache[program_id] = entry
+            elif metrics is not None:
+                metrics.cached = True
+
+            # Hand out copies, so callers can't change what's cached.
             if convert_to_python_types:
-                return convert_sv_types(fields_dict)
+                if entry["converted"] is None:
+                    if metrics is not None:
+                        start = time.perf_counter()
+                    entry["converted"] = convert_sv_types(entry["raw"])
+                    if metrics is not None:
+                        metrics.add("convert", time.perf_counter() - start)
+                return {k: dict(v) for k, v in entry["converted"].items()}
             else:
-                return fields_dict
+                return dict(entry["raw"])
+
+    def invalidate_program_schema(self, program_id: Optional[str] = None):
+        """
+        Drop a cached program schema, or all of them if no program_id is
+        given, so the next get_program_schema fetches it fresh.
+        """
+        with self._schema_lock:
+            if program_id is None:
+                self._schema_cache.clear()
+            else:
+                self._schema_cache.pop(program_id, None)
+
+    def get_phone_index(
+        self, program_id: str, refresh: bool = False, country_code: str = "1"
+    ) -> Dict[str, Optional[str]]:
+        """
+        {normalized phone: customer id (None if there isn't one)} for every
+        participant in the program, from a full export (see
+        make_phone_index). Kept for phone_index_ttl seconds; set refresh to
+        True to export again regardless.
+        """
+        key = (program_id, country_code)
+        with self._phone_index_lock:
+            entry = self._phone_indexes.get(key)
+
+        if (
+            entry is None
+            or refresh
+            or (entry["expires"] is not None and time.monotonic() >= entry["expires"])
+        ):
+            phones = []
+            customer_ids = []
+            for item in self.iter_participants(program_id):
+                phones.append(item.get("phone"))
+                customer_ids.append(item.get("customerId"))
+
+            entry = {
+                "index": make_phone_index(phones, customer_ids, country_code),
+                "expires": (
+                    None
+                    if self.phone_index_ttl is None
+                    else time.monotonic() + self.phone_index_ttl
+                ),
+            }
+            with self._phone_index_lock:
+                self._phone_indexes[key] = entry
+
+        with self._phone_index_lock:
+            return dict(entry["index"])
+
+    def _add_to_phone_index(self, program_id: str, records_df: "pd.DataFrame"):
+        """
+        Add the phones of rows just upserted to the program's cached phone
+        indexes, if there are any, so the next dedupe counts them as taken.
+        """
+        if "phone" not in records_df.columns:
+            return
+
+        with self._phone_index_lock:
+            entries = [
+                (country_code, entry)
+                for (cached_program, country_code), entry in self._phone_indexes.items()
+                if cached_program == program_id
+            ]
+        if not entries:
+            return
 
+        if "customer_id" in records_df.columns:
+            customer_ids = records_df["customer_id"].tolist()
         else:
-            raise APIError(r.status_code, f"API reason: {r.text}")
+            customer_ids = [None] * len(records_df)
+
+        for country_code, entry in entries:
+            added = make_phone_index(records_df["phone"], customer_ids, country_code)
+            with self._phone_index_lock:
+                entry["index"].update(added)
+
+    def invalidate_phone_index(self, program_id: Optional[str] = None):
+        """
+        Drop a program's cached phone index, or all of them if no program_id
+        is given, so the next dedupe exports the program again.
+        """
+        with self._phone_index_lock:
+            if program_id is None:
+                self._phone_indexes.clear()
+            else:
+                for key in [k for k in self._phone_indexes if k[0] == program_id]:
+                    del self._phone_indexes[key]
@@ -0,0 +1,218 @@
+import sqlite3
+import logging
+import threading
+from signalvine_sdk.codec import JSONCodec, get_codec
+from signalvine_sdk.common import convert_participant_to_record
+from signalvine_sdk.dedupe import normalize_phone
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from signalvine_sdk.sdk import SignalVineSDK
+
+LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS participants (
+    id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    phone TEXT,
+    version TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS participants_customer_id ON participants (customer_id);
+CREATE INDEX IF NOT EXISTS participants_phone ON participants (phone);
+CREATE TABLE IF NOT EXISTS memberships (
+    group_name TEXT NOT NULL,
+    participant_id TEXT NOT NULL,
+    PRIMARY KEY (group_name, participant_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS memberships_participant_id ON memberships (participant_id);
+"""
+
+
+class ParticipantStore:
+    """A program's participants kept locally in SQLite, as
+    convert_participant_to_record makes them, indexed by participant id,
+    customer id, phone and group, so looking one up doesn't take an export.
+
+    Attributes:
+        program_id -- the program the participants are in
+        path -- the SQLite database file; ":memory:" keeps it in memory
+        include_agg -- keep the message counts in the records too
+    """
+
+    def __init__(
+        self,
+        program_id: str,
+        path: str = ":memory:",
+        include_agg: bool = False,
+        country_code: str = "1",
+        codec: Optional[JSONCodec] = None,
+    ):
+        self.program_id = program_id
+        self.path = path
+        self.include_agg = include_agg
+        self.country_code = country_code
+        self.codec = codec if codec is not None else get_codec()
+
+        # One connection, shared by every thread through the lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('program_id', ?)", (program_id,)
+            )
+            stored = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'program_id'"
+            ).fetchone()[0]
+        if stored != program_id:
+            self._conn.close()
+            raise ValueError(
+                f"{path} holds the participants of {stored}, not {program_id}"
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+
+    def _version(self, item: Dict) -> str:
+        """
+        What changes when the participant does: the latest profile field
+        update, and the message counts if they're kept.
+        """
+        version = max((p.get("updated") or "" for p in item["profile"]), default="")
+        if self.include_agg:
+            version += (
+                f"/{item['receivedCount']}/{item['scheduledCount']}/{item['sentCount']}"
+            )
+        return version
+
+    def refresh(
+        self, sdk: "SignalVineSDK", chunk_size: int = 500, full: bool = False
+    ) -> Dict[str, int]:
+        """
+        Bring the store up to date with the program, through
+        sdk.iter_participants. The API can't list only what changed, so
+        every participant is still read, but only the ones whose profile
+        was updated since (by the profile fields' updated timestamps) are
+        converted and written; participants no longer in the program are
+        removed. With full, every participant is rewritten.
+
+        Changes that don't touch the profile, like groups alone, only show
+        up with full. Returns how many participants were added, updated,
+        unchanged and removed.
+        """
+        with self._lock:
+            known = dict(self._conn.execute("SELECT id, version FROM participants"))
+
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        rows = []
+        memberships = []
+
+        for item in sdk.iter_participants(self.program_id, chunk_size):
+            participant_id = item["id"]
+            if participant_id in seen:
+                # Showed up on two pages while paging.
+                continue
+            seen.add(participant_id)
+
+            version = self._version(item)
+            stored = known.get(participant_id)
+            if stored == version and not full:
+                counts["unchanged"] += 1
+                continue
+            counts["added" if stored is None else "updated"] += 1
+
+            record = convert_participant_to_record(item, self.include_agg)
+            phone = item.get("phone") or record.get("phone")
+            rows.append(
+                (
+                    participant_id,
+                    item.get("customerId") or record.get("customer_id"),
+                    (
+                        None
+                        if phone is None
+                        else normalize_phone(phone, self.country_code)
+                    ),
+                    version,
+                    self.codec.dumps(record),
+                )
+            )
+            memberships.extend(
+                (group, participant_id) for group in item.get("groups") or ()
+            )
+
+        removed = [(participant_id,) for participant_id in known.keys() - seen]
+        counts["removed"] = len(removed)
+
+        # All or nothing, so a failed export leaves the store as it was.
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM memberships WHERE participant_id = ?",
+                [(row[0],) for row in rows] + removed,
+            )
+            self._conn.executemany("DELETE FROM participants WHERE id = ?", removed)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO participants VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO memberships VALUES (?, ?)", memberships
+            )
+
+        LOGGER.info(f"Refreshed participants of {self.program_id}: {counts}")
+        return counts
+
+    def _records(self, query: str, *params) -> List[Dict]:
+        with self._lock:
+            found = self._conn.execute(query, params).fetchall()
+        return [self.codec.loads(record) for record, in found]
+
+    def get(self, participant_id: str) -> Optional[Dict]:
+        """
+        The record of a participant by id, or None if it isn't stored.
+        """
+        found = self._records(
+            "SELECT record FROM participants WHERE id = ?", participant_id
+        )
+        return found[0] if found else None
+
+    def by_customer_id(self, customer_id: str) -> List[Dict]:
+        return self._records(
+            "SELECT record FROM participants WHERE customer_id = ?", customer_id
+        )
+
+    def by_phone(self, phone: str) -> List[Dict]:
+        """
+        Records with this phone, however it's written (see normalize_phone).
+        """
+        phone = normalize_phone(phone, self.country_code)
+        if phone is None:
+            return []
+        return self._records("SELECT record FROM participants WHERE phone = ?", phone)
+
+    def in_group(self, group: str) -> List[Dict]:
+        return self._records(
+            "SELECT p.record FROM memberships m JOIN participants p ON p.id = m.participant_id"
+            " WHERE m.group_name = ? ORDER BY p.id",
+            group,
+        )
+
+    def records(self) -> List[Dict]:
+        """
+        Every stored record, in participant id order; pd.DataFrame(records)
+        makes a frame of them.
+        """
+        return self._records("SELECT record FROM participants ORDER BY id")
@@ -0,0 +1,191 @@
+import logging
+from signalvine_sdk.common import ValidationError, convert_sv_types
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    # pandas is only imported where it's used, as it's slow to import.
+    import numpy as np
+    import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+# Upsert columns that are participant attributes rather than profile
+# fields, so they're never in a program schema.
+BUILTIN_COLUMNS = {
+    "phone": {"type": "str", "required": False},
+    "customer_id": {"type": "str", "required": False},
+    "group_list": {"type": "str", "required": False},
+    "opt_in": {"type": "bool", "required": False},
+}
+
+_BOOLEANS = {"true", "false"}
+
+# What's wrong with a value that can't be taken as the type.
+_PROBLEMS = {
+    "bool": "not a boolean",
+    "int": "not an integer",
+    "float": "not a number",
+    "date": "not a date",
+}
+
+
+def schema_rules(schema: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    What each column may hold, from a program schema as get_program_schema
+    returns it ({name: SignalVine type}): convert_sv_types's
+    {name: {"type", "required"}}, with the type "date" for Dates, which
+    convert_sv_types leaves as "str", and the built-in columns added.
+    """
+    rules = dict(BUILTIN_COLUMNS)
+    rules.update(convert_sv_types(schema))
+    for name, sv_type in schema.items():
+        if "Date" in sv_type:
+            rules[name]["type"] = "date"
+    return rules
+
+
+def _blank(values: "pd.Series") -> "np.ndarray":
+    # Empty CSV fields: missing, or only whitespace. A plain loop over the
+    # strings beats the .str methods at this.
+    import numpy as np
+
+    blank = values.isna().to_numpy()
+    if values.dtype == object:
+        blank |= np.fromiter(
+            (isinstance(v, str) and not v.strip() for v in values.to_numpy()),
+            dtype=bool,
+            count=len(values),
+        )
+    return blank
+
+
+def _not_coercible(values: "pd.Series", to: str) -> "pd.Series":
+    import pandas as pd
+
+    if to == "bool":
+        return ~values.astype(str).str.strip().str.lower().isin(_BOOLEANS)
+    if to == "int":
+        numbers = pd.to_numeric(values, errors="coerce")
+        return numbers.isna() | (numbers % 1 != 0)
+    if to == "float":
+        return pd.to_numeric(values, errors="coerce").isna()
+    if to == "date":
+        return pd.to_datetime(values, errors="coerce").isna()
+    return pd.Series(False, index=values.index)
+
+
+def _check_column(values: "pd.Series", to: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Which values are blank, and which of the others can't be taken as the
+    type, as boolean arrays. Typed columns mostly repeat a few values, so
+    both are worked out once per distinct value. Columns with a dtype of
+    the type already only need checking for blanks.
+    """
+    import numpy as np
+    import pandas as pd
+    from pandas.api import types
+
+    if to not in _PROBLEMS:
+        # Text; only blanks matter, and text is often all distinct.
+        return _blank(values), np.zeros(len(values), dtype=bool)
+
+    if (
+        (to == "bool" and types.is_bool_dtype(values))
+        or (to == "int" and types.is_integer_dtype(values))
+        or (
+            to == "float"
+            and types.is_numeric_dtype(values)
+            and not types.is_bool_dtype(values)
+        )
+        or (to == "date" and types.is_datetime64_any_dtype(values))
+    ):
+        blank = values.isna().to_numpy()
+        return blank, np.zeros(len(values), dtype=bool)
+
+    # Missing values get the code -1, which picks the extra last entry.
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=values.dtype)
+
+    blank = np.append(_blank(uniques), True)
+    bad = np.append(_not_coercible(uniques, to).to_numpy() & ~blank[:-1], False)
+
+    return blank[codes], bad[codes]
+
+
+def validate_records(records_df: "pd.DataFrame", schema: Dict[str, str]) -> List[Dict]:
+    """
+    Check a DataFrame against a program schema ({name: SignalVine type}, as
+    get_program_schema returns it), a column at a time, before upserting it.
+
+    Returns a list of problems, empty if there are none, each a dict:
+        column -- the column
+        problem -- "unknown column", "missing" (a blank value in a field
+            that isn't Maybe), "not a boolean", "not an integer", "not a
+            number" or "not a date"
+        rows -- index labels of the rows with the problem; None for an
+            unknown column
+
+    Booleans are true or false in any case, integers may be written as
+    floats as long as they're whole, and dates are anything pd.to_datetime
+    reads. Blank values are fine in Maybe fields. Schema fields that aren't
+    columns aren't checked; an upsert leaves them as they are.
+    """
+    rules = schema_rules(schema)
+    problems = []
+
+    for column in records_df.columns:
+        rule = rules.get(column)
+        if rule is None:
+            problems.append(
+                {"column": column, "problem": "unknown column", "rows": None}
+            )
+            continue
+
+        if not rule["required"] and rule["type"] not in _PROBLEMS:
+            # Optional text; anything goes.
+            continue
+
+        values = records_df[column]
+        blank, bad = _check_column(values, rule["type"])
+
+        if rule["required"] and blank.any():
+            problems.append(
+                {
+                    "column": column,
+                    "problem": "missing",
+                    "rows": values.index[blank].tolist(),
+                }
+            )
+
+        if bad.any():
+            problems.append(
+                {
+                    "column": column,
+                    "problem": _PROBLEMS[rule["type"]],
+                    "rows": values.index[bad].tolist(),
+                }
+            )
+
+    return problems
+
+
+def raise_for_problems(problems: List[Dict], max_rows: int = 5):
+    """
+    Raise ValidationError if there are problems, with a message listing
+    them and up to max_rows rows of each.
+    """
+    if not problems:
+        return
+
+    lines = []
+    for p in problems:
+        line = f"{p['column']}: {p['problem']}"
+        if p["rows"] is not None:
+            shown = ", ".join(str(row) for row in p["rows"][:max_rows])
+            more = len(p["rows"]) - max_rows
+            line += f" in rows {shown}" + (f" and {more} more" if more > 0 else "")
+        lines.append(line)
+
+    raise ValidationError(
+        problems, "Records don't fit the schema:\n" + "\n".join(lines)
+    )
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import pandas as pd
+import pytest
+from urllib.parse import parse_qs, urlsplit
+from signalvine_sdk.async_sdk import AsyncSignalVineSDK
+from signalvine_sdk.common import APIError, sign_request
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FakeResponse:
+    def __init__(self, status=200, payload=None, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self.content = json.dumps(payload if payload is not None else {}).encode()
+
+    async def read(self):
+        return self.content
+
+
+class FakeRequest:
+    """
+    What aiohttp's session.request returns: an async context manager
+    giving the response.
+    """
+
+    def __init__(self, handler, method, url, kwargs):
+        self.handler = handler
+        self.args = (method, url, kwargs)
+
+    async def __aenter__(self):
+        return await self.handler(*self.args)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class FakeSession:
+    """
+    Stands in for aiohttp.ClientSession; replies come from an async
+    handler called with (method, url, kwargs).
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+        self.closed = False
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return FakeRequest(self.handler, method, url, kwargs)
+
+    async def close(self):
+        self.closed = True
+
+
+def make_sdk(session, **kwargs):
+    return AsyncSignalVineSDK(
+        account_number="1234",
+        account_token="INVENTED_TOKEN",
+        account_secret="INVENTED_SECRET",
+        api_hostname="http://localhost",
+        session=session,
+        **kwargs,
+    )
+
+
+def paged_participants(total, delay=None, cancelled=None):
+    """
+    A handler serving `total` participants through count/offset paging,
+    each page after delay(offset) seconds. Pages cancelled while waiting
+    go in cancelled.
+    """
+
+    async def handler(method, url, kwargs):
+        query = parse_qs(urlsplit(url).query)
+        count = int(query["count"][0])
+        offset = int(query["offset"][0])
+        try:
+            await asyncio.sleep(delay(offset) if delay else 0)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(offset)
+            raise
+        items = [{"id": str(n)} for n in range(offset, min(offset + count, total))]
+        return FakeResponse(payload={"items": items})
+
+    return handler
+
+
+class TestClass:
+    def test_signed_bytes_sent(self):
+
+        async def handler(method, url, kwargs):
+            if method == "POST":
+                return FakeResponse(202, headers={"Location": "/v2/jobs/1"})
+            return FakeResponse(payload={"items": [{"id": "p1"}]})
+
+        session = FakeSession(handler)
+
+        async def run():
+            async with make_sdk(session) as sdk:
+                df = pd.DataFrame(
+                    {"customer_id": ["1", "2"], "full_name": ["Zoë", "A\\B"]}
+                )
+                location = await sdk.upsert_participants("p1", df)
+                programs = await sdk.get_programs()
+            return location, programs
+
+        assert asyncio.run(run()) == ("/v2/jobs/1", [{"id": "p1"}])
+        # it's the caller's to close
+        assert not session.closed
+
+        (post, url, kwargs), (get, _, get_kwargs) = session.calls
+        assert (post, url) == ("POST", "http://localhost/v2/programs/p1/participants")
+        data = kwargs["data"]
+        assert isinstance(data, bytes)
+        assert json.loads(data)["participants"].startswith("customer_id,full_name\n")
+
+        # the signature is over exactly the bytes sent
+        headers = kwargs["headers"]
+        signature = sign_request(
+            "INVENTED_TOKEN",
+            "INVENTED_SECRET",
+            headers["SignalVine-Date"],
+            "POST",
+            "/v2/programs/p1/participants",
+            data,
+        )
+        assert headers["Authorization"] == f"SignalVine INVENTED_TOKEN:{signature}"
+
+        assert get == "GET"
+        assert get_kwargs["data"] is None
+
+    def test_unexpected_status(self):
+
+        async def handler(method, url, kwargs):
+            return FakeResponse(500, {"message": "broken"})
+
+        async def run():
+            async with make_sdk(FakeSession(handler)) as sdk:
+                await sdk.get_programs()
+
+        with pytest.raises(APIError) as e:
+            asyncio.run(run())
+        assert e.value.status_code == 500
+
+    def test_max_concurrency(self):
+
+        out = 0
+        most = 0
+        pages = paged_participants(2000)
+
+        async def handler(method, url, kwargs):
+            nonlocal out, most
+            out += 1
+            most = max(most, out)
+            try:
+                await asyncio.sleep(0.01)
+                return await pages(method, url, kwargs)
+            finally:
+                out -= 1
+
+        async def run():
+            async with make_sdk(FakeSession(handler), max_concurrency=3) as sdk:
+                return await sdk.fetch_all_participants("p1", workers=8, chunk_size=100)
+
+        participants = asyncio.run(run())
+        assert [p["id"] for p in participants] == [str(n) for n in range(2000)]
+        assert most == 3
+
+    def test_pages_in_order(self):
+
+        cancelled = []
+        # later pages come back first; ones past the end never do
+        handler = paged_participants(
+            1050,
+            delay=lambda offset: 10 if offset > 1000 else (1000 - offset) / 20000,
+            cancelled=cancelled,
+        )
+
+        async def run():
+            async with make_sdk(FakeSession(handler)) as sdk:
+                participants = await sdk.fetch_all_participants(
+                    "p1", workers=4, chunk_size=100
+                )
+                # let the cancellations go through
+                await asyncio.sleep(0)
+                # nothing's left running
+                assert asyncio.all_tasks() == {asyncio.current_task()}
+            return participants
+
+        participants = asyncio.run(run())
+        assert [p["id"] for p in participants] == [str(n) for n in range(1050)]
+        # pages past the short one that had started were stopped
+        assert set(cancelled) <= {1100, 1200, 1300}
+
+    def test_iter_participants_stopped_early(self):
+
+        cancelled = []
+        handler = paged_participants(
+            10000, delay=lambda offset: 0.01 * (offset > 0), cancelled=cancelled
+        )
+
+        async def run():
+            async with make_sdk(FakeSession(handler)) as sdk:
+                participants = sdk.iter_participants("p1", chunk_size=100, prefetch=2)
+                async for item in participants:
+                    if item["id"] == "5":
+                        break
+                await participants.aclose()
+                await asyncio.sleep(0)
+                assert asyncio.all_tasks() == {asyncio.current_task()}
+
+        asyncio.run(run())
+        # the prefetched pages that were out when it stopped
+        assert 100 in cancelled
+        assert set(cancelled) <= {100, 200}
+
+    def test_wait_for_location(self):
+
+        polls = []
+
+        async def handler(method, url, kwargs):
+            polls.append(url)
+            done = url.endswith("/done") and len(polls) >= 3
+            return FakeResponse(
+                payload={"complete": done, "error": done, "message": "1 bad row"}
+            )
+
+        async def run(path, timeout):
+            async with make_sdk(FakeSession(handler)) as sdk:
+                return await sdk.wait_for_location(
+                    path, interval=0.001, max_interval=0.002, timeout=timeout
+                )
+
+        assert asyncio.run(run("/v2/jobs/done", 5)) == "1 bad row"
+        assert len(polls) == 3
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run("/v2/jobs/never", 0.05))
+
+    def test_poll_locations(self):
+
+        # each job completes after this many checks
+        checks_needed = {"/jobs/1": 3, "/jobs/2": 1, "/jobs/3": 2}
+        checks = {}
+
+        async def handler(method, url, kwargs):
+            path = urlsplit(url).path
+            checks[path] = checks.get(path, 0) + 1
+            complete = checks[path] >= checks_needed.get(path, 1000)
+            return FakeResponse(
+                payload={
+                    "complete": complete,
+                    "error": path == "/jobs/3",
+                    "message": "nope",
+                }
+            )
+
+        async def run(paths, timeout=None):
+            async with make_sdk(FakeSession(handler)) as sdk:
+                results = []
+                try:
+                    async for result in sdk.poll_locations(
+                        paths, interval=0.001, max_interval=0.004, timeout=timeout
+                    ):
+                        results.append(result)
+                finally:
+                    await asyncio.sleep(0)
+                    # nothing's left polling
+                    assert asyncio.all_tasks() == {asyncio.current_task()}
+                return results
+
+        results = asyncio.run(run(checks_needed))
+        assert results == [("/jobs/2", None), ("/jobs/3", "nope"), ("/jobs/1", None)]
+        # nothing is checked again once it's complete
+        assert checks == checks_needed
+
+        checks.clear()
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(run(["/jobs/2", "/jobs/never"], timeout=0.05))
+        assert checks["/jobs/2"] == 1
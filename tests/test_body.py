@@ -0,0 +1,110 @@
+import gzip
+import json
+import logging
+import pandas as pd
+from signalvine_sdk.body import SpooledBody, write_upsert_body
+from signalvine_sdk.codec import get_codec
+from signalvine_sdk.common import make_body, sign_request
+
+LOGGER = logging.getLogger(__name__)
+
+
+def make_frame(rows):
+    return pd.DataFrame(
+        {
+            "customer_id": [str(n) for n in range(rows)],
+            "full_name": [f"Flintstone, Fred {n}" for n in range(rows)],
+            "note": ['said "yabba dabba doo"\nand left'] * rows,
+            "score": [n / 3 for n in range(rows)],
+        }
+    )
+
+
+class TestClass:
+    def test_write_upsert_body(self):
+
+        df = make_frame(25)
+
+        for threshold, codec in ((2**20, None), (100, get_codec())):
+            with SpooledBody(
+                "INVENTED_TOKEN", "INVENTED_SECRET", "POST", "/bogus", threshold
+            ) as body:
+                write_upsert_body(body, "1234", df, chunk_rows=7, codec=codec)
+                payload = bytes(body.payload())
+                headers = body.build_headers()
+
+            # same bytes as encoding the whole body in one go
+            expected = json.dumps(make_body("1234", df), separators=(",", ":"))
+            assert payload == expected.encode()
+            assert body.size == len(payload)
+
+            # signed as if the whole body had been signed at once
+            assert headers[
+                "Authorization"
+            ] == "SignalVine INVENTED_TOKEN:" + sign_request(
+                "INVENTED_TOKEN",
+                "INVENTED_SECRET",
+                headers["SignalVine-Date"],
+                "POST",
+                "/bogus",
+                expected,
+            )
+
+    def test_write_upsert_body_records(self):
+
+        df = make_frame(25)
+        expected = json.dumps(make_body("1234", df), separators=(",", ":")).encode()
+
+        # rows as dicts go through without pandas, to the same bytes
+        with SpooledBody(
+            "INVENTED_TOKEN", "INVENTED_SECRET", "POST", "/bogus", 100
+        ) as body:
+            write_upsert_body(body, "1234", df.to_dict("records"), chunk_rows=7)
+            assert bytes(body.payload()) == expected
+
+        expected = json.dumps(
+            make_body("1234", df, existing_columns=["full_name"]), separators=(",", ":")
+        ).encode()
+        with SpooledBody(
+            "INVENTED_TOKEN", "INVENTED_SECRET", "POST", "/bogus", 100
+        ) as body:
+            write_upsert_body(body, "1234", df, existing_columns=["full_name"])
+            assert bytes(body.payload()) == expected
+
+    def test_write_upsert_body_empty(self):
+
+        with SpooledBody("INVENTED_TOKEN", "INVENTED_SECRET", "POST", "/bogus") as body:
+            write_upsert_body(body, "1234", make_frame(0))
+            payload = bytes(body.payload())
+
+        assert json.loads(payload) == make_body("1234", make_frame(0))
+
+    def test_compress(self):
+
+        df = make_frame(200)
+        expected = json.dumps(make_body("1234", df), separators=(",", ":"))
+
+        for threshold in (2**20, 100):
+            with SpooledBody(
+                "INVENTED_TOKEN", "INVENTED_SECRET", "POST", "/bogus", threshold
+            ) as body:
+                write_upsert_body(body, "1234", df)
+                body.compress()
+                payload = bytes(body.payload())
+                headers = body.build_headers()
+
+            assert len(payload) < len(expected) / 4
+            assert gzip.decompress(payload) == expected.encode()
+
+            # still signed over what the server gets after decompressing
+            assert headers["Content-Encoding"] == "gzip"
+            assert headers["Authorization"].endswith(
+                sign_request(
+                    "INVENTED_TOKEN",
+                    "INVENTED_SECRET",
+                    headers["SignalVine-Date"],
+                    "POST",
+                    "/bogus",
+                    expected,
+                )
+            )
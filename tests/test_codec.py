@@ -0,0 +1,58 @@
+import json
+import logging
+import pytest
+from signalvine_sdk.codec import JSONCodec, get_codec
+
+LOGGER = logging.getLogger(__name__)
+
+CODECS = ["json", "orjson", "ujson"]
+
+
+def codec_or_skip(name):
+    try:
+        return get_codec(name)
+    except ValueError:
+        pytest.skip(f"{name} isn't installed")
+
+
+class TestClass:
+    @pytest.mark.parametrize("name", CODECS)
+    def test_dumps_matches_signed_encoding(self, name):
+
+        codec = codec_or_skip(name)
+
+        body = {
+            "program": "1234",
+            "options": {
+                "new": "add",
+                "mode": "tx",
+                "existing": ["a", "b"],
+                "absent": "ignore",
+            },
+            "participants": 'a,b\n"Flintstone, Fred",/usr\tx\x00\r\n',
+        }
+        # non-ASCII and DEL have to come out escaped as well
+        with_unicode = dict(body, participants="Zoë,Ⅻ,😀,\x7f\n")
+
+        for obj in (body, with_unicode, ["a", 1, None, True]):
+            expected = json.dumps(obj, separators=(",", ":"))
+            assert codec.dumps(obj) == expected.encode()
+
+        for text in (body["participants"], with_unicode["participants"]):
+            assert codec.escape(text) == json.dumps(text)[1:-1].encode()
+
+    @pytest.mark.parametrize("name", CODECS)
+    def test_loads(self, name):
+
+        codec = codec_or_skip(name)
+
+        page = {"items": [{"id": "1", "name": "Zoë", "sort": -2, "active": False}]}
+        assert codec.loads(json.dumps(page).encode()) == page
+
+    def test_get_codec(self):
+
+        assert type(get_codec("json")) is JSONCodec
+        assert isinstance(get_codec(), JSONCodec)
+
+        with pytest.raises(ValueError):
+            get_codec("yaml")
@@ -2,15 +2,21 @@ import logging
 import csv
 from datetime import datetime, timezone
 import io
+import json
+import pytest
 from attr import s
 
 import pandas as pd
 from signalvine_sdk.common import (
+    RetryPolicy,
     build_headers,
     convert_participant_to_record,
     convert_participants_to_records,
     convert_sv_types,
+    iter_csv_chunks,
+    iter_json_items,
     make_body,
+    participants_to_dataframe,
     sign_request,
 )
 
@@ -33,6 +39,21 @@ class TestClass:
 
         assert result == "P1f0up2G0I6tJG4D3nRed/IlvvT2tqEQqbqEPXNQXDo="
 
+        # a body as bytes signs the same as the text
+        body = '{"program":"1234","participants":"First_Name\\nSteve\\n"}'
+        as_text = sign_request(
+            "INVENTED_TOKEN", "INVENTED_SECRET", test_date, "POST", "/bogus", body
+        )
+        as_bytes = sign_request(
+            "INVENTED_TOKEN",
+            "INVENTED_SECRET",
+            test_date,
+            "POST",
+            "/bogus",
+            body.encode(),
+        )
+        assert as_text == as_bytes
+
     def test_build_headers(self):
 
         result = build_headers(
@@ -51,6 +72,59 @@ class TestClass:
         # A date should exist
         assert result["SignalVine-Date"]
 
+    def test_retry_policy(self):
+
+        policy = RetryPolicy(max_attempts=3, backoff=1, max_backoff=10, jitter=0)
+
+        assert policy.should_retry(1, 503)
+        assert policy.should_retry(2)
+        assert not policy.should_retry(3, 503)
+        assert not policy.should_retry(1, 400)
+
+        # exponential backoff, capped
+        assert [policy.get_delay(n) for n in (1, 2, 3, 5)] == [1, 2, 4, 10]
+
+        # Retry-After in seconds or as a date; never shorter than the backoff
+        assert policy.get_delay(1, "7") == 7
+        assert policy.get_delay(3, "2") == 4
+        assert policy.get_delay(1, "Wed, 21 Oct 2015 07:28:00 GMT") == 1
+        assert policy.get_delay(1, "whenever") == 1
+
+    def test_iter_json_items(self):
+
+        document = {
+            "total": 12345,
+            "meta": {"items": ["not these"]},
+            "items": [
+                {"id": "1", "name": "Zoë", "sort": -2, "score": 3.25},
+                {"id": "2", "name": 'Fred \\ "Flintstone"', "groups": []},
+                12345678,
+                None,
+            ],
+            "after": True,
+        }
+        data = json.dumps(document, indent=1, ensure_ascii=False).encode()
+
+        # fed a few bytes at a time, so values and characters get split
+        for size in (1, 3, 7, len(data)):
+            chunks = [data[i : i + size] for i in range(0, len(data), size)]
+            assert list(iter_json_items(chunks)) == document["items"]
+
+        # numbers cut anywhere, including after the point or the exponent
+        items = [1500.0, -0.25, 1e-07, 6.02e23, 2e300, 7, -12.5e1]
+        data = b'{"items": [1500.0, -0.25, 1e-7, 6.02E+23, 2e300, 7, -12.5e1]}'
+        for cut in range(1, len(data)):
+            chunks = [data[:cut], data[cut:]]
+            assert list(iter_json_items(chunks)) == items, cut
+
+        assert list(iter_json_items([b'{"items": []}'])) == []
+
+        with pytest.raises(KeyError):
+            list(iter_json_items([b'{"fields": [1, 2]}']))
+
+        with pytest.raises(ValueError):
+            list(iter_json_items([b'{"items": [{"id": "1"}, {"id":']))
+
     def test_convert_participant_to_record(self, include_agg=True):
 
         item = {
@@ -551,6 +625,84 @@ class TestClass:
             }
         ]
 
+    def test_participants_to_dataframe(self):
+
+        def profile(**values):
+            return [
+                {"name": k, "type": "String", "value": v} for k, v in values.items()
+            ]
+
+        items = [
+            {
+                "profile": profile(first_name="Steve", act=""),
+                "receivedCount": 1,
+                "scheduledCount": 0,
+                "sentCount": 2,
+            },
+            {
+                # sparse: missing act, adds a field the first one doesn't have
+                "profile": profile(first_name="Fred", email="fred@flintstone.com"),
+                "receivedCount": 0,
+                "scheduledCount": 3,
+                "sentCount": 0,
+            },
+        ]
+
+        df = participants_to_dataframe(items, include_agg=True)
+
+        assert df.columns.tolist() == [
+            "first_name",
+            "act",
+            "agg_receivedCount",
+            "agg_scheduledCount",
+            "agg_sentCount",
+            "email",
+        ]
+        assert df.to_dict("records") == [
+            {
+                "first_name": "Steve",
+                "act": None,
+                "agg_receivedCount": 1,
+                "agg_scheduledCount": 0,
+                "agg_sentCount": 2,
+                "email": None,
+            },
+            {
+                "first_name": "Fred",
+                "act": None,
+                "agg_receivedCount": 0,
+                "agg_scheduledCount": 3,
+                "agg_sentCount": 0,
+                "email": "fred@flintstone.com",
+            },
+        ]
+
+        # Same frame as going through records, except that an all-empty
+        # column stays object/None instead of becoming float/NaN.
+        pd.testing.assert_frame_equal(
+            df,
+            pd.DataFrame(convert_participants_to_records(items, include_agg=True)),
+            check_dtype=False,
+        )
+
+        # a repeated name makes up the count of a field that's missing
+        repeated = [
+            {"profile": profile(a="1", b="2", c="3")},
+            {"profile": profile(a="4") + profile(a="5", b="6")},
+            {"profile": profile(a="7", b="8", c="9")},
+        ]
+        df = participants_to_dataframe(repeated)
+        assert df.to_dict("records") == [
+            {"a": "1", "b": "2", "c": "3"},
+            {"a": "5", "b": "6", "c": None},
+            {"a": "7", "b": "8", "c": "9"},
+        ]
+        pd.testing.assert_frame_equal(
+            df, pd.DataFrame(convert_participants_to_records(repeated))
+        )
+
+        assert participants_to_dataframe([]).empty
+
     def test_make_body(self):
 
         items = """
@@ -561,7 +713,10 @@ class TestClass:
         f = io.StringIO(items)
 
         items_df = pd.read_csv(
-            f, quoting=csv.QUOTE_MINIMAL, dtype=str, encoding="unicode_escape",
+            f,
+            quoting=csv.QUOTE_MINIMAL,
+            dtype=str,
+            encoding="unicode_escape",
         )
 
         records = make_body("1234-123-123-1234", items_df, "add")
@@ -588,6 +743,100 @@ class TestClass:
             "participants": 'group_list,target_group,opt_in,phone,email,first_name,customer_id,ref,full_name,last_name\nArts and Sciences,,True,+1 555-555-5555,stta9820@colorado.edu,Steve,1234-123-123-1234,123456780,"Taylor, Steve",Taylor\n',
         }
 
+    def test_make_body_records(self, tmp_path):
+
+        rows = [
+            {"customer_id": "1", "full_name": "Taylor, Steve", "opt_in": True},
+            {"customer_id": "2", "full_name": 'Said "hi"', "opt_in": None},
+        ]
+        expected = make_body("1234", pd.DataFrame(rows))
+
+        # dicts, and the CSV file the frame would write, give the same body
+        assert make_body("1234", rows) == expected
+        assert make_body("1234", iter(rows)) == expected
+        path = tmp_path / "rows.csv"
+        pd.DataFrame(rows).to_csv(path, index=False)
+        assert make_body("1234", path) == expected
+        assert make_body("1234", str(path)) == expected
+
+        # columns picks and orders them, for any kind of records
+        body = make_body("1234", rows, columns=["full_name", "customer_id"])
+        assert body["options"]["existing"] == ["full_name", "customer_id"]
+        assert body == make_body("1234", path, columns=["full_name", "customer_id"])
+        assert body == make_body(
+            "1234", pd.DataFrame(rows), columns=["full_name", "customer_id"]
+        )
+
+        # existing_columns limits what's updated, not what's sent
+        body = make_body("1234", rows, existing_columns=["full_name"])
+        assert body["options"]["existing"] == ["full_name"]
+        assert body["participants"] == expected["participants"]
+        assert (
+            make_body("1234", rows, existing_columns=[])["options"]["existing"]
+            == "ignore"
+        )
+
+        # keys missing from a row are empty; keys that aren't columns are an error
+        assert make_body("1234", [{"a": "1", "b": "2"}, {"a": "3"}])[
+            "participants"
+        ] == ("a,b\n1,2\n3,\n")
+        with pytest.raises(ValueError):
+            make_body("1234", [{"a": "1"}, {"a": "2", "b": "3"}])
+        with pytest.raises(ValueError):
+            make_body("1234", path, columns=["nope"])
+
+        assert make_body("1234", []) == {
+            "program": "1234",
+            "options": {
+                "new": "add",
+                "mode": "tx",
+                "existing": "ignore",
+                "absent": "ignore",
+            },
+            "participants": "",
+        }
+
+    def test_iter_csv_chunks(self):
+
+        pa = pytest.importorskip("pyarrow")
+        df = pd.DataFrame(
+            {
+                "customer_id": [str(n) for n in range(10)],
+                "score": [n / 3 for n in range(10)],
+            }
+        )
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        columns, chunks = iter_csv_chunks(df, chunk_rows=4)
+        expected = list(chunks)
+        assert columns == ["customer_id", "score"]
+        assert "".join(expected) == df.to_csv(index=False, line_terminator="\n")
+
+        for records in (table, table.to_batches()[0], df.to_dict("records")):
+            columns, chunks = iter_csv_chunks(records, chunk_rows=4)
+            assert columns == ["customer_id", "score"]
+            assert list(chunks) == expected
+
+        columns, chunks = iter_csv_chunks(table, columns=["score"], chunk_rows=None)
+        assert "".join(chunks) == df[["score"]].to_csv(
+            index=False, line_terminator="\n"
+        )
+
+    def test_iter_csv_chunks_file(self, tmp_path):
+
+        # as Excel saves a UTF-8 CSV, byte order mark first
+        path = tmp_path / "participants.csv"
+        path.write_bytes(
+            "customer_id,first_name\r\n1,Zoë\r\n2,Ann\r\n".encode("utf-8-sig")
+        )
+
+        columns, chunks = iter_csv_chunks(str(path))
+        assert columns == ["customer_id", "first_name"]
+        assert "".join(chunks) == "customer_id,first_name\n1,Zoë\n2,Ann\n"
+
+        columns, chunks = iter_csv_chunks(path, columns=["first_name", "customer_id"])
+        assert "".join(chunks) == "first_name,customer_id\nZoë,1\nAnn,2\n"
+
     def test_convert_sv_types(self):
 
         sv_types = {
@@ -0,0 +1,163 @@
+import logging
+import pandas as pd
+import pytest
+from signalvine_sdk.common import DuplicatePhoneError
+from signalvine_sdk.dedupe import (
+    dedupe_phones,
+    find_duplicate_phones,
+    make_phone_index,
+    normalize_phones,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def make_frame():
+    return pd.DataFrame(
+        {
+            "phone": [
+                "303-555-0100",
+                "+1 (303) 555-0100",
+                "3035550101",
+                "13035550102",
+                "3035550103",
+                "",
+                None,
+            ],
+            "customer_id": ["a", "b", "c", "d", None, "f", "g"],
+            "first_name": ["A", "B", "C", "D", "E", "F", "G"],
+        },
+        index=[10, 11, 12, 13, 14, 15, 16],
+    )
+
+
+# c is already in the program under its own customer id, d's phone belongs
+# to x, and 0103 belongs to someone without one, who the row without one is.
+EXISTING = {"+13035550101": "c", "+13035550102": "x", "+13035550103": None}
+
+
+class TestClass:
+    def test_normalize_phones(self):
+
+        phones = normalize_phones(
+            [
+                "(303) 555-0100",
+                "+44 20 7946 0958",
+                "13035550101",
+                3035550102,
+                "555-0100",
+                "",
+                None,
+                float("nan"),
+            ]
+        )
+        assert phones.tolist() == [
+            "+13035550100",
+            "+442079460958",
+            "+13035550101",
+            "+13035550102",
+            None,
+            None,
+            None,
+            None,
+        ]
+
+        assert normalize_phones(["7946 0958 12"], country_code="44").tolist() == [
+            "+447946095812"
+        ]
+
+        series = pd.Series(["3035550100"], index=["x"])
+        assert normalize_phones(series).index.tolist() == ["x"]
+
+    def test_make_phone_index(self):
+
+        index = make_phone_index(
+            ["3035550100", "303555010", "3035550101", "3035550102"],
+            ["a", "b", "", float("nan")],
+        )
+        assert index == {
+            "+13035550100": "a",
+            "+13035550101": None,
+            "+13035550102": None,
+        }
+
+    def test_find_duplicate_phones(self):
+
+        found = find_duplicate_phones(make_frame(), EXISTING)
+        assert found.index.tolist() == [10, 11, 13]
+        assert found["phone"].tolist() == [
+            "+13035550100",
+            "+13035550100",
+            "+13035550102",
+        ]
+        assert found["duplicate"].tolist() == [True, True, False]
+        assert found["first"].tolist() == [True, False, False]
+        assert found["in_program"].tolist() == [False, False, True]
+        assert found.loc[13, "existing_customer_id"] == "x"
+
+        assert find_duplicate_phones(make_frame()).index.tolist() == [10, 11]
+
+    def test_dedupe_phones(self):
+
+        kept, report = dedupe_phones(make_frame(), "drop", EXISTING)
+        assert kept.index.tolist() == [12, 14, 15, 16]
+        assert report == [
+            {
+                "row": 10,
+                "phone": "+13035550100",
+                "customer_id": "a",
+                "reason": "duplicate",
+                "existing_customer_id": None,
+            },
+            {
+                "row": 11,
+                "phone": "+13035550100",
+                "customer_id": "b",
+                "reason": "duplicate",
+                "existing_customer_id": None,
+            },
+            {
+                "row": 13,
+                "phone": "+13035550102",
+                "customer_id": "d",
+                "reason": "in program",
+                "existing_customer_id": "x",
+            },
+        ]
+
+        kept, report = dedupe_phones(make_frame(), "first", EXISTING)
+        assert kept.index.tolist() == [10, 12, 14, 15, 16]
+        assert [r["row"] for r in report] == [11, 13]
+
+        kept, report = dedupe_phones(make_frame().iloc[2:], "raise")
+        assert report == []
+        assert len(kept) == 5
+
+        with pytest.raises(DuplicatePhoneError) as e:
+            dedupe_phones(make_frame(), "raise", EXISTING)
+        assert [r["row"] for r in e.value.duplicates] == [10, 11, 13]
+        assert "3 rows clash on phone" in e.value.message
+
+        with pytest.raises(ValueError):
+            dedupe_phones(make_frame(), "keep")
+
+    def test_dedupe_phones_without_customer_ids(self):
+
+        # updates to participants already in the program, found by phone
+        existing = {"+13035550100": "a", "+13035550101": None}
+        df = pd.DataFrame(
+            {"phone": ["3035550100", "3035550101"], "first_name": ["A", "B"]}
+        )
+        kept, report = dedupe_phones(df, "drop", existing)
+        assert report == []
+        assert len(kept) == 2
+
+        # the participant with the phone has no customer id yet
+        df["customer_id"] = ["a", "b"]
+        kept, report = dedupe_phones(df, "drop", existing)
+        assert report == []
+
+        # but one with another customer id is still someone else
+        df["customer_id"] = ["z", "b"]
+        kept, report = dedupe_phones(df, "drop", existing)
+        assert [(r["row"], r["existing_customer_id"]) for r in report] == [(0, "a")]
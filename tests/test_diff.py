@@ -0,0 +1,117 @@
+import logging
+import pandas as pd
+import pytest
+from signalvine_sdk.diff import cell_fingerprints, diff_records, merge_snapshot
+
+LOGGER = logging.getLogger(__name__)
+
+
+def make_frame():
+    return pd.DataFrame(
+        {
+            "customer_id": ["a", "b", "c"],
+            "act": ["20", None, "3"],
+            "first_name": ["Ann", "Bob", "Cat"],
+        }
+    )
+
+
+class TestClass:
+    def test_cell_fingerprints(self):
+
+        cells = cell_fingerprints(make_frame())
+        assert cells.index.tolist() == ["a", "b", "c"]
+        assert cells.index.name == "customer_id"
+        assert cells.columns.tolist() == ["act", "first_name"]
+        assert str(cells.dtypes.unique()[0]) == "uint64"
+
+        # the same text hashes the same, whatever the type; missing is blank
+        typed = make_frame().assign(act=[20, "", 3])
+        assert cell_fingerprints(typed).equals(cells)
+
+        with pytest.raises(ValueError):
+            cell_fingerprints(make_frame(), key="id")
+        with pytest.raises(ValueError):
+            cell_fingerprints(make_frame().assign(customer_id=["a", "a", "c"]))
+        with pytest.raises(ValueError):
+            cell_fingerprints(make_frame().assign(customer_id=["a", None, "c"]))
+
+    def test_diff_records(self):
+
+        snapshot = cell_fingerprints(make_frame())
+
+        desired = pd.DataFrame(
+            {
+                "customer_id": ["b", "a", "d", "c"],
+                "act": [None, 20, "1", 3],
+                "first_name": ["Bob", "Anne", "Dan", "Cat"],
+            }
+        )
+        diff = diff_records(desired, snapshot)
+        assert diff["new"].tolist() == [False, False, True, False]
+        assert diff["changed"].tolist() == [False, True, False, False]
+        assert diff["columns"] == ["first_name"]
+
+        # a column the snapshot hasn't got is a change for every row
+        diff = diff_records(desired.assign(email="x"), snapshot)
+        assert diff["changed"].tolist() == [True, True, False, True]
+        assert diff["columns"] == ["first_name", "email"]
+
+        diff = diff_records(desired)
+        assert diff["new"].all()
+        assert not diff["changed"].any()
+        assert diff["columns"] == []
+
+    def test_diff_records_export(self):
+
+        # a snapshot of an export, all strings, against typed records
+        export = pd.DataFrame(
+            {
+                "customer_id": ["a", "b", "c"],
+                "act": ["20", "", "31"],
+                "honors": ["true", "false", "true"],
+                "opt_in": ["false", "true", ""],
+            }
+        )
+        desired = pd.DataFrame(
+            {
+                "customer_id": ["a", "b", "c"],
+                "act": [20.0, None, 31.0],
+                "honors": [True, False, False],
+                "opt_in": [False, "True", None],
+            }
+        )
+        diff = diff_records(desired, cell_fingerprints(export))
+        assert diff["changed"].tolist() == [False, False, True]
+        assert diff["columns"] == ["honors"]
+
+    def test_merge_snapshot(self):
+
+        snapshot = cell_fingerprints(make_frame())
+        sent = pd.DataFrame(
+            {
+                "customer_id": ["d", "a"],
+                "first_name": ["Dan", "Anne"],
+                "email": ["d@", ""],
+            }
+        )
+        merged = merge_snapshot(snapshot, cell_fingerprints(sent))
+
+        assert merged.index.tolist() == ["a", "b", "c", "d"]
+        assert merged.columns.tolist() == ["act", "first_name", "email"]
+        assert merged.index.name == "customer_id"
+        assert str(merged.dtypes.unique()[0]) == "uint64"
+
+        now = pd.DataFrame(
+            {
+                "customer_id": ["a", "b", "c", "d"],
+                "act": ["20", None, "3", None],
+                "first_name": ["Anne", "Bob", "Cat", "Dan"],
+                "email": [None, None, None, "d@"],
+            }
+        )
+        diff = diff_records(now, merged)
+        assert not diff["new"].any()
+        assert not diff["changed"].any()
+
+        assert merge_snapshot(None, snapshot).equals(snapshot)
@@ -0,0 +1,72 @@
+import json
+import logging
+import subprocess
+import sys
+import signalvine_sdk
+
+LOGGER = logging.getLogger(__name__)
+
+HEAVY = {"pandas", "requests", "aiohttp", "box", "prometheus_client", "opentelemetry"}
+
+
+def heavy_imports(code):
+    """
+    The heavy dependencies a fresh interpreter has imported after running code.
+    """
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport sys, json\nprint(json.dumps(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return HEAVY & set(json.loads(out))
+
+
+class TestClass:
+    def test_import_is_light(self):
+
+        assert heavy_imports("import signalvine_sdk") == set()
+        assert (
+            heavy_imports(
+                "from signalvine_sdk import build_headers, parse_location_status, TokenBucket"
+            )
+            == set()
+        )
+        assert heavy_imports("from signalvine_sdk import SignalVineSDK") == {"requests"}
+        assert heavy_imports("from signalvine_sdk import AsyncSignalVineSDK") == set()
+        # upsert bodies from dicts don't need pandas
+        assert (
+            heavy_imports(
+                "from signalvine_sdk import make_body; make_body('1234', [{'a': 1}])"
+            )
+            == set()
+        )
+
+    def test_public_names(self):
+
+        # the same objects the modules have
+        from signalvine_sdk.sdk import SignalVineSDK
+        from signalvine_sdk.metrics import PHASES
+
+        assert signalvine_sdk.SignalVineSDK is SignalVineSDK
+        assert signalvine_sdk.PHASES is PHASES
+        assert "SignalVineSDK" in dir(signalvine_sdk)
+
+        namespace = {}
+        exec("from signalvine_sdk import *", namespace)
+        assert set(signalvine_sdk.__all__) <= set(namespace)
+
+    def test_submodules(self):
+
+        # in a fresh interpreter, so nothing has imported them yet
+        code = (
+            "import signalvine_sdk\n"
+            "assert signalvine_sdk.sdk.SignalVineSDK is signalvine_sdk.SignalVineSDK\n"
+            "assert signalvine_sdk.common.sign_request is signalvine_sdk.sign_request\n"
+            "assert not hasattr(signalvine_sdk, 'nothing')"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,135 @@
+import logging
+import pytest
+from signalvine_sdk.common import APIError
+from signalvine_sdk.metrics import (
+    InMemoryInstrumentation,
+    OpenTelemetryInstrumentation,
+    PrometheusInstrumentation,
+    RequestMetrics,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def report(instrumentation, endpoint="get_programs", status_code=200, error=None):
+    metrics = RequestMetrics(endpoint, "GET", instrumentation)
+    try:
+        with metrics:
+            metrics.status_code = status_code
+            metrics.retries = 1
+            metrics.bytes_received = 100
+            metrics.add("network", 0.5)
+            metrics.add("network", 0.25)
+            if error is not None:
+                raise error
+    except Exception as e:
+        assert e is error
+    return metrics
+
+
+class FakeSpan:
+    def __init__(self, name, start_time, attributes):
+        self.name = name
+        self.start_time = start_time
+        self.attributes = attributes
+        self.exceptions = []
+        self.status = None
+        self.end_time = None
+
+    def record_exception(self, e):
+        self.exceptions.append(e)
+
+    def set_status(self, status):
+        self.status = status
+
+    def end(self, end_time=None):
+        self.end_time = end_time
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time=None, attributes=None):
+        self.spans.append(FakeSpan(name, start_time, attributes))
+        return self.spans[-1]
+
+
+class TestClass:
+    def test_in_memory(self):
+
+        instrumentation = InMemoryInstrumentation()
+        report(instrumentation)
+        report(instrumentation, status_code=500, error=APIError(500, "no"))
+
+        summary = instrumentation.summary()["get_programs"]
+        assert summary["calls"] == 2
+        assert summary["errors"] == 1
+        assert summary["retries"] == 2
+        assert summary["bytes_received"] == 200
+        assert summary["phases"] == {"network": 1.5}
+
+        instrumentation.reset()
+        assert instrumentation.summary() == {}
+
+    def test_failing_instrumentation(self):
+
+        class Broken(InMemoryInstrumentation):
+            def on_request(self, metrics):
+                raise RuntimeError("broken")
+
+        # logged, not raised
+        report(Broken())
+
+    def test_opentelemetry(self):
+
+        tracer = FakeTracer()
+        instrumentation = OpenTelemetryInstrumentation(tracer)
+        metrics = report(instrumentation, status_code=None, error=ConnectionError())
+
+        (span,) = tracer.spans
+        assert span.name == "signalvine get_programs"
+        assert span.attributes["http.request.method"] == "GET"
+        assert "http.response.status_code" not in span.attributes
+        assert span.attributes["signalvine.phase.network_seconds"] == 0.75
+        assert span.exceptions == [metrics.error]
+        assert span.end_time >= span.start_time
+
+    def test_prometheus(self):
+
+        prometheus_client = pytest.importorskip("prometheus_client")
+        registry = prometheus_client.CollectorRegistry()
+        instrumentation = PrometheusInstrumentation(registry)
+        report(instrumentation)
+        report(instrumentation, status_code=None, error=ConnectionError())
+
+        def sample(name, **labels):
+            return registry.get_sample_value(name, labels)
+
+        assert (
+            sample(
+                "signalvine_requests_total",
+                endpoint="get_programs",
+                method="GET",
+                status="200",
+            )
+            == 1
+        )
+        assert (
+            sample(
+                "signalvine_requests_total",
+                endpoint="get_programs",
+                method="GET",
+                status="ConnectionError",
+            )
+            == 1
+        )
+        assert sample("signalvine_retries_total", endpoint="get_programs") == 2
+        assert (
+            sample(
+                "signalvine_phase_duration_seconds_count",
+                endpoint="get_programs",
+                phase="network",
+            )
+            == 2
+        )
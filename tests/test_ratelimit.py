@@ -0,0 +1,69 @@
+import logging
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from signalvine_sdk.ratelimit import FileTokenBucket, TokenBucket
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TestClass:
+    def test_token_bucket(self):
+
+        bucket = TokenBucket(rate=100, capacity=2)
+
+        # the burst is free, the rest are paced at the rate
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(6)]
+        elapsed = time.monotonic() - start
+
+        assert waits[:2] == [0, 0]
+        assert elapsed >= 0.035
+
+        assert bucket.try_acquire(5) > 0
+
+    def test_token_bucket_slow_rate(self):
+
+        # under one a second, the bucket still holds a whole token
+        bucket = TokenBucket(rate=0.5)
+        assert bucket.capacity == 1
+        assert bucket.acquire() == 0
+        assert 1.9 < bucket.try_acquire() <= 2
+
+        with pytest.raises(ValueError):
+            bucket.acquire(2)
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_token_bucket_threads(self):
+
+        bucket = TokenBucket(rate=200, capacity=1)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: bucket.acquire(), range(21)))
+
+        # 20 tokens after the first one, at 200/s
+        assert time.monotonic() - start >= 0.09
+
+    def test_file_token_bucket_shared(self, tmp_path):
+
+        # two buckets on one file, as two processes would have
+        first = FileTokenBucket.for_account(
+            "1234", rate=1, capacity=3, directory=tmp_path
+        )
+        second = FileTokenBucket.for_account(
+            "1234", rate=1, capacity=3, directory=tmp_path
+        )
+        assert first.path == second.path
+
+        assert first.try_acquire() == 0
+        assert second.try_acquire() == 0
+        assert first.try_acquire() == 0
+        assert second.try_acquire() > 0
+
+        # a different account has its own bucket
+        other = FileTokenBucket.for_account(
+            "5678", rate=1, capacity=3, directory=tmp_path
+        )
+        assert other.try_acquire() == 0
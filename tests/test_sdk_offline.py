@@ -0,0 +1,604 @@
+import json
+import logging
+import threading
+import time
+import pandas as pd
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from signalvine_sdk.common import (
+    APIError,
+    DuplicatePhoneError,
+    RetryPolicy,
+    ValidationError,
+)
+from signalvine_sdk.metrics import Instrumentation
+from signalvine_sdk.sdk import SignalVineSDK
+
+LOGGER = logging.getLogger(__name__)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload if payload is not None else {}
+        self.headers = headers or {}
+        self.content = json.dumps(self.payload).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """
+    Stands in for requests.Session. Replies are either queued up front or
+    made by a handler called with (method, url, kwargs).
+    """
+
+    def __init__(self, responses=None, handler=None):
+        self.headers = {}
+        self.responses = list(responses or [])
+        self.handler = handler
+        self.calls = []
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.calls.append((method, url, kwargs))
+            if self.handler is None:
+                return self.responses.pop(0)
+        return self.handler(method, url, kwargs)
+
+    def close(self):
+        self.closed = True
+
+
+def paged_participants(total):
+    """
+    A handler serving `total` participants through count/offset paging.
+    """
+
+    def handler(method, url, kwargs):
+        query = parse_qs(urlsplit(url).query)
+        count = int(query["count"][0])
+        offset = int(query["offset"][0])
+        items = [{"id": str(n)} for n in range(offset, min(offset + count, total))]
+        return FakeResponse(payload={"items": items})
+
+    return handler
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.reported = []
+
+    def on_request(self, metrics):
+        self.reported.append(metrics)
+
+
+def make_sdk(session, **kwargs):
+    return SignalVineSDK(
+        account_number="1234",
+        account_token="INVENTED_TOKEN",
+        account_secret="INVENTED_SECRET",
+        api_hostname="http://localhost",
+        session=session,
+        **kwargs,
+    )
+
+
+class TestClass:
+    def test_session_shared_and_closed(self):
+
+        session = FakeSession(
+            [
+                FakeResponse(payload={"items": [{"id": "p1"}]}),
+                FakeResponse(payload={"fields": [{"name": "x", "type": "String"}]}),
+            ]
+        )
+
+        with make_sdk(session) as sdk:
+            assert sdk.get_programs() == [{"id": "p1"}]
+            assert sdk.get_program_schema("p1") == {"x": "String"}
+
+        # it's the caller's to close
+        assert not session.closed
+        assert [c[1] for c in session.calls] == [
+            "http://localhost/v1/accounts/1234/programs?active=all",
+            "http://localhost/v1/programs/p1?type=schema",
+        ]
+        assert session.calls[0][2]["headers"]["Authorization"].startswith(
+            "SignalVine INVENTED_TOKEN:"
+        )
+
+    def test_keep_alive_off(self):
+
+        with make_sdk(None, keep_alive=False) as sdk:
+            assert sdk.session.headers["Connection"] == "close"
+
+        # a session passed in is left as it is
+        session = FakeSession()
+        make_sdk(session, keep_alive=False)
+        assert session.headers == {}
+
+    def test_compression(self):
+
+        with make_sdk(None) as sdk:
+            assert "gzip" in sdk.session.headers["Accept-Encoding"]
+        with make_sdk(None, compress_responses=False) as sdk:
+            assert sdk.session.headers["Accept-Encoding"] == "identity"
+
+        session = FakeSession([FakeResponse(202, headers={"Location": "/jobs/1"})] * 2)
+        sdk = make_sdk(session, compress_requests_over=1024)
+        sdk.upsert_participants("p1", pd.DataFrame({"customer_id": ["1"]}))
+        sdk.upsert_participants("p1", pd.DataFrame({"customer_id": ["1"] * 1000}))
+        assert "Content-Encoding" not in session.calls[0][2]["headers"]
+        assert session.calls[1][2]["headers"]["Content-Encoding"] == "gzip"
+
+    def test_iter_participants(self):
+
+        session = FakeSession(handler=paged_participants(25))
+        sdk = make_sdk(session)
+
+        ids = [p["id"] for p in sdk.iter_participants("p1", chunk_size=10, prefetch=3)]
+        assert ids == [str(n) for n in range(25)]
+
+        # no prefetching pages one at a time, stopping on the short page
+        session.calls.clear()
+        ids = [p["id"] for p in sdk.iter_participants("p1", chunk_size=5, prefetch=0)]
+        assert ids == [str(n) for n in range(25)]
+        assert len(session.calls) == 6
+
+    def test_fetch_all_participants(self):
+
+        handler = paged_participants(95)
+
+        def shifting(method, url, kwargs):
+            # the second page overlaps the first, as if someone was removed
+            r = handler(method, url, kwargs)
+            if "offset=10&" in url:
+                r = FakeResponse(
+                    payload={"items": [{"id": "9"}] + r.json()["items"][:-1]}
+                )
+            return r
+
+        sdk = make_sdk(FakeSession(handler=shifting))
+
+        items = sdk.fetch_all_participants("p1", workers=4, chunk_size=10)
+        ids = [p["id"] for p in items]
+        assert ids == [str(n) for n in range(95) if n != 19]
+
+    def test_upsert_participants_batched(self):
+
+        def handler(method, url, kwargs):
+            rows = json.loads(kwargs["data"])["participants"].splitlines()[1:]
+            if "bad" in rows:
+                return FakeResponse(400, {"message": "bad row"})
+            return FakeResponse(202, headers={"Location": f"/jobs/{rows[0]}"})
+
+        sdk = make_sdk(FakeSession(handler=handler))
+        df = pd.DataFrame({"customer_id": [str(n) for n in range(9)]})
+        df.loc[4, "customer_id"] = "bad"
+
+        results = sdk.upsert_participants_batched(
+            "p1", df, batch_size=4, max_in_flight=2
+        )
+
+        assert [(r["batch"], r["start"], r["stop"]) for r in results] == [
+            (0, 0, 4),
+            (1, 4, 8),
+            (2, 8, 9),
+        ]
+        assert [r["location"] for r in results] == ["/jobs/0", None, "/jobs/8"]
+        assert results[1]["status_code"] == 400
+
+        # redo just the failed one
+        df.loc[4, "customer_id"] = "4"
+        results = sdk.upsert_participants_batched("p1", df, batch_size=4, batches=[1])
+        assert [(r["batch"], r["location"]) for r in results] == [(1, "/jobs/4")]
+
+        # a batch that can't get through is reported with the rest
+        def unreachable(method, url, kwargs):
+            if "4" in json.loads(kwargs["data"])["participants"]:
+                raise requests.ConnectionError("refused")
+            return handler(method, url, kwargs)
+
+        sdk = make_sdk(
+            FakeSession(handler=unreachable),
+            retry_policy=RetryPolicy(max_attempts=2, backoff=0.001),
+        )
+        results = sdk.upsert_participants_batched("p1", df, batch_size=4)
+        assert [r["location"] for r in results] == ["/jobs/0", None, "/jobs/8"]
+        assert results[1]["status_code"] is None
+        assert results[1]["error"] == "ConnectionError: refused"
+
+    def test_poll_locations(self):
+
+        # each job completes after this many checks
+        checks_needed = {"/jobs/1": 3, "/jobs/2": 1, "/jobs/3": 2}
+        checks = {}
+
+        def handler(method, url, kwargs):
+            path = urlsplit(url).path
+            checks[path] = checks.get(path, 0) + 1
+            complete = checks[path] >= checks_needed[path]
+            error = path == "/jobs/3"
+            return FakeResponse(
+                payload={"complete": complete, "error": error, "message": "nope"}
+            )
+
+        sdk = make_sdk(FakeSession(handler=handler))
+
+        results = list(
+            sdk.poll_locations(checks_needed, interval=0.001, max_interval=0.004)
+        )
+
+        assert results == [("/jobs/2", None), ("/jobs/3", "nope"), ("/jobs/1", None)]
+        # nothing is checked again once it's complete
+        assert checks == checks_needed
+
+    def test_retry(self):
+
+        session = FakeSession(
+            [
+                FakeResponse(503, {"message": "busy"}),
+                FakeResponse(429, {"message": "slow down"}, {"Retry-After": "0"}),
+                FakeResponse(payload={"items": []}),
+                FakeResponse(500, {"message": "broken"}),
+                FakeResponse(500, {"message": "still broken"}),
+            ]
+        )
+        sdk = make_sdk(session, retry_policy=RetryPolicy(max_attempts=3, backoff=0.001))
+
+        assert sdk.get_programs() == []
+        assert len(session.calls) == 3
+        assert sdk.retry_counts == {503: 1, 429: 1}
+
+        # out of attempts
+        sdk.retry_policy.max_attempts = 2
+        with pytest.raises(APIError) as e:
+            sdk.get_programs()
+        assert e.value.status_code == 500
+        assert sdk.retry_counts[500] == 1
+
+    def test_request_timeout(self):
+
+        stalls = [requests.Timeout("stalled")]
+
+        def handler(method, url, kwargs):
+            if stalls:
+                raise stalls.pop()
+            return FakeResponse(payload={"items": []})
+
+        session = FakeSession(handler=handler)
+        sdk = make_sdk(
+            session,
+            request_timeout=0.5,
+            retry_policy=RetryPolicy(max_attempts=2, backoff=0.001),
+        )
+
+        # every request has it, and one that times out is tried again
+        assert sdk.get_programs() == []
+        assert [c[2]["timeout"] for c in session.calls] == [0.5, 0.5]
+        assert sdk.retry_counts == {"Timeout": 1}
+
+        session.calls.clear()
+        make_sdk(session).get_programs()
+        assert session.calls[0][2]["timeout"] == (10.0, 120.0)
+
+    def test_retry_spooled_upsert(self):
+
+        received = []
+
+        def handler(method, url, kwargs):
+            # Read the body as requests does: files from where they are.
+            data = kwargs["data"]
+            received.append(data.read() if hasattr(data, "read") else bytes(data))
+            if len(received) == 1:
+                return FakeResponse(503, {"message": "busy"})
+            return FakeResponse(202, headers={"Location": "/v2/jobs/1"})
+
+        session = FakeSession(handler=handler)
+        sdk = make_sdk(
+            session,
+            spool_threshold=100,
+            retry_policy=RetryPolicy(max_attempts=3, backoff=0.001),
+        )
+        df = pd.DataFrame({"customer_id": [str(n) for n in range(50)]})
+
+        assert sdk.upsert_participants("p1", df) == "/v2/jobs/1"
+        assert len(received) == 2
+        assert len(received[0]) > 100
+        assert received[1] == received[0]
+        assert json.loads(received[1])["participants"].count("\n") == 51
+
+    def test_program_schema_cache(self):
+
+        fields = {"fields": [{"name": "honors", "type": "Maybe (Boolean)"}]}
+        session = FakeSession(
+            [
+                FakeResponse(payload=fields, headers={"ETag": '"v1"'}),
+                FakeResponse(304),
+                FakeResponse(payload=fields, headers={"ETag": '"v1"'}),
+            ]
+        )
+        sdk = make_sdk(session)
+
+        assert sdk.get_program_schema("p1") == {"honors": "Maybe (Boolean)"}
+        assert sdk.get_program_schema("p1", convert_to_python_types=True) == {
+            "honors": {"type": "bool", "required": False}
+        }
+        assert len(session.calls) == 1
+
+        # past the ttl it's revalidated, and a 304 keeps what we had
+        sdk.schema_ttl = 0
+        sdk._schema_cache["p1"]["expires"] = 0
+        assert sdk.get_program_schema("p1") == {"honors": "Maybe (Boolean)"}
+        assert session.calls[1][2]["headers"]["If-None-Match"] == '"v1"'
+
+        # after invalidating it's an ordinary fetch
+        sdk.invalidate_program_schema("p1")
+        sdk.get_program_schema("p1")
+        assert "If-None-Match" not in session.calls[2][2]["headers"]
+        assert len(session.calls) == 3
+
+    def test_coalesce_gets(self):
+
+        def slow(method, url, kwargs):
+            time.sleep(0.2)
+            return FakeResponse(payload={"items": [{"id": "p1"}]})
+
+        session = FakeSession(handler=slow)
+        sdk = make_sdk(session)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: sdk.get_programs(), range(8)))
+        assert results == [[{"id": "p1"}]] * 8
+        assert len(session.calls) == 1
+
+        # once it's back, the next one goes out again
+        sdk.get_programs()
+        assert len(session.calls) == 2
+
+    def test_iter_participants_chunk(self):
+
+        session = FakeSession(handler=paged_participants(25))
+        sdk = make_sdk(session)
+
+        items = sdk.iter_participants_chunk("p1", chunk_size=10, offset=20, read_size=5)
+        assert [p["id"] for p in items] == [str(n) for n in range(20, 25)]
+        assert session.calls[0][2]["stream"]
+
+    def test_instrumentation(self):
+
+        session = FakeSession(
+            [
+                FakeResponse(503),
+                FakeResponse(payload={"items": [{"id": "p1"}]}),
+                FakeResponse(payload={"fields": [{"name": "x", "type": "String"}]}),
+                FakeResponse(202, headers={"Location": "/v2/jobs/1"}),
+                FakeResponse(404),
+            ]
+        )
+        recorder = Recorder()
+        sdk = make_sdk(
+            session,
+            instrumentation=recorder,
+            retry_policy=RetryPolicy(backoff=0.01, jitter=0),
+        )
+
+        sdk.get_programs()
+        sdk.get_program_schema("p1", convert_to_python_types=True)
+        sdk.get_program_schema("p1")
+        sdk.upsert_participants("p1", pd.DataFrame({"x": ["a", "b"]}))
+        with pytest.raises(APIError):
+            sdk.get_location_status("/v2/jobs/1")
+
+        programs, schema, cached, upsert, status = recorder.reported
+
+        assert (programs.endpoint, programs.action) == ("get_programs", "GET")
+        assert programs.status_code == 200
+        assert programs.retries == 1
+        # the failed attempt's body counts too
+        assert programs.bytes_received == len("{}") + len(
+            json.dumps({"items": [{"id": "p1"}]})
+        )
+        assert set(programs.phases) == {"wait", "sign", "network", "parse"}
+        assert programs.error is None
+        assert programs.duration >= programs.phases["wait"] >= 0.01
+
+        assert "convert" in schema.phases
+        assert cached.cached and cached.status_code is None
+
+        assert upsert.status_code == 202
+        assert upsert.bytes_sent == len(session.calls[3][2]["data"])
+        assert {"serialize", "sign", "network"} <= set(upsert.phases)
+
+        assert status.status_code == 404
+        assert isinstance(status.error, APIError)
+
+    def test_instrumentation_streaming(self):
+
+        session = FakeSession(handler=paged_participants(25))
+        recorder = Recorder()
+        sdk = make_sdk(session, instrumentation=recorder)
+
+        items = sdk.iter_participants_chunk("p1", chunk_size=10, read_size=5)
+        next(items)
+        assert not recorder.reported
+
+        # stopping early still reports, and isn't a failure
+        items.close()
+        (metrics,) = recorder.reported
+        assert metrics.endpoint == "iter_participants_chunk"
+        assert metrics.error is None
+        assert metrics.phases["parse"] > 0
+
+    def test_upsert_validate(self):
+
+        schema = {"fields": [{"name": "act", "type": "Maybe (Numeric)"}]}
+        session = FakeSession(
+            [
+                FakeResponse(payload=schema),
+                FakeResponse(202, headers={"Location": "/v2/jobs/1"}),
+            ]
+        )
+        sdk = make_sdk(session)
+
+        bad = pd.DataFrame({"customer_id": ["1", "2"], "act": ["20", "lots"]})
+        assert sdk.validate_participants("p1", bad) == [
+            {"column": "act", "problem": "not an integer", "rows": [1]}
+        ]
+        with pytest.raises(ValidationError):
+            sdk.upsert_participants("p1", bad, validate=True)
+        with pytest.raises(ValidationError):
+            sdk.upsert_participants_batched("p1", bad, validate=True)
+
+        # nothing was sent; the schema was fetched once
+        assert len(session.calls) == 1
+
+        good = bad.iloc[:1]
+        assert sdk.upsert_participants("p1", good, validate=True) == "/v2/jobs/1"
+
+        with pytest.raises(TypeError):
+            sdk.validate_participants("p1", good.to_dict("records"))
+
+    def test_upsert_dedupe(self):
+
+        def handler(method, url, kwargs):
+            if method == "GET":
+                query = parse_qs(urlsplit(url).query)
+                items = [{"id": "1", "customerId": "x", "phone": "+13035550100"}]
+                if query["offset"][0] != "0":
+                    items = []
+                return FakeResponse(payload={"items": items})
+            rows = json.loads(kwargs["data"])["participants"].splitlines()[1:]
+            return FakeResponse(202, headers={"Location": f"/v2/jobs/{len(rows)}"})
+
+        session = FakeSession(handler=handler)
+        sdk = make_sdk(session)
+
+        df = pd.DataFrame(
+            {
+                "customer_id": ["a", "b", "c", "d", "e"],
+                "phone": [
+                    "303-555-0100",
+                    "3035550101",
+                    "3035550101",
+                    "3035550102",
+                    "3035550103",
+                ],
+            }
+        )
+
+        kept, report = sdk.dedupe_participants("p1", df)
+        assert kept["customer_id"].tolist() == ["d", "e"]
+        assert [(r["row"], r["reason"]) for r in report] == [
+            (0, "in program"),
+            (1, "duplicate"),
+            (2, "duplicate"),
+        ]
+
+        with pytest.raises(DuplicatePhoneError):
+            sdk.upsert_participants("p1", df, dedupe="raise")
+
+        assert sdk.upsert_participants("p1", df, dedupe="first") == "/v2/jobs/3"
+        # the index was exported once, and the phones sent are taken now
+        assert sum(method == "GET" for method, _, _ in session.calls) == 1
+        assert sdk.get_phone_index("p1")["+13035550102"] == "d"
+
+        # d again is fine; f has e's phone
+        results = sdk.upsert_participants_batched(
+            "p1", df.iloc[3:].assign(customer_id=["d", "f"]), dedupe="drop"
+        )
+        assert [r["location"] for r in results] == ["/v2/jobs/1"]
+
+        with pytest.raises(TypeError):
+            sdk.dedupe_participants("p1", df.to_dict("records"))
+
+        sdk.invalidate_phone_index("p1")
+        assert sdk.get_phone_index("p1") == {"+13035550100": "x"}
+        assert sum(method == "GET" for method, _, _ in session.calls) == 2
+
+    def test_upsert_changes(self, tmp_path):
+
+        def profile(customer_id, first_name, act):
+            values = {"customer_id": customer_id, "first_name": first_name, "act": act}
+            return [{"name": name, "value": value} for name, value in values.items()]
+
+        exported = [
+            {"id": "1", "profile": profile("a", "Ann", "20")},
+            {"id": "2", "profile": profile("b", "Bob", "")},
+            {"id": "3", "profile": profile("c", "Cat", "31")},
+        ]
+        sent = []
+
+        def handler(method, url, kwargs):
+            if method == "GET":
+                offset = int(parse_qs(urlsplit(url).query)["offset"][0])
+                return FakeResponse(payload={"items": exported if offset == 0 else []})
+            sent.append(json.loads(kwargs["data"]))
+            return FakeResponse(202, headers={"Location": f"/v2/jobs/{len(sent)}"})
+
+        session = FakeSession(handler=handler)
+        sdk = make_sdk(session)
+        path = str(tmp_path / "snapshot.pkl")
+
+        desired = pd.DataFrame(
+            {
+                "customer_id": ["a", "b", "c"],
+                "first_name": ["Ann", "Bob", "Cathy"],
+                "act": [20, None, 31],
+            }
+        )
+        result = sdk.upsert_changes("p1", desired, snapshot_path=path)
+        assert result == {
+            "location": "/v2/jobs/1",
+            "new": 0,
+            "changed": 1,
+            "unchanged": 2,
+            "columns": ["first_name"],
+        }
+        # just the changed row and column
+        assert sent[0]["participants"] == "customer_id,first_name\nc,Cathy\n"
+        assert sent[0]["options"]["existing"] == ["first_name"]
+
+        # nothing changed since; no export, nothing sent
+        assert sdk.upsert_changes("p1", desired)["location"] is None
+        assert len(sent) == 1
+
+        # a new participant gets every column; the others only what changed
+        desired.loc[1, "act"] = 25
+        desired.loc[3] = ["d", "Dan", 22]
+        result = sdk.upsert_changes("p1", desired, snapshot_path=path)
+        assert (result["new"], result["changed"], result["columns"]) == (1, 1, ["act"])
+        assert (
+            sent[1]["participants"]
+            == "customer_id,first_name,act\nb,Bob,25.0\nd,Dan,22.0\n"
+        )
+        assert sent[1]["options"]["existing"] == ["act"]
+
+        # another client picks up from the saved snapshot without an export
+        gets = sum(method == "GET" for method, _, _ in session.calls)
+        other = make_sdk(session)
+        assert (
+            other.upsert_changes("p1", desired, snapshot_path=path)["location"] is None
+        )
+        assert sum(method == "GET" for method, _, _ in session.calls) == gets
+
+        # refresh goes back to SignalVine, which hasn't run the jobs here
+        result = sdk.upsert_changes("p1", desired, refresh=True)
+        assert (result["new"], result["changed"]) == (1, 2)
+
+        with pytest.raises(TypeError):
+            sdk.upsert_changes("p1", desired.to_dict("records"))
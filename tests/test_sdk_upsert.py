@@ -3,7 +3,6 @@ import pytest
 import os, io, csv
 from signalvine_sdk.sdk import SignalVineSDK
 from signalvine_sdk.common import APIError
-from box import Box
 import logging
 
 LOGGER = logging.getLogger(__name__)
@@ -0,0 +1,134 @@
+import logging
+import pytest
+from signalvine_sdk.store import ParticipantStore
+
+LOGGER = logging.getLogger(__name__)
+
+
+def make_item(n, updated="2020-10-28T14:36:57.831Z", first_name=None, groups=("All",)):
+    values = {
+        "first_name": first_name or f"First{n}",
+        "customer_id": f"cust-{n}",
+        "phone": f"+1303555{n:04d}",
+    }
+    return {
+        "id": f"id-{n:04d}",
+        "customerId": values["customer_id"],
+        "phone": values["phone"],
+        "groups": list(groups),
+        "profile": [
+            {"name": name, "value": value, "updated": updated}
+            for name, value in values.items()
+        ],
+        "receivedCount": 0,
+        "scheduledCount": 0,
+        "sentCount": n,
+    }
+
+
+class FakeSDK:
+    """
+    Stands in for SignalVineSDK, with participants set up front.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.exports = 0
+
+    def iter_participants(self, program_id, chunk_size=500):
+        self.exports += 1
+        yield from self.items
+
+
+class TestClass:
+    def test_refresh(self, tmp_path):
+
+        items = [
+            make_item(n, groups=("All", "Odd") if n % 2 else ("All",)) for n in range(5)
+        ]
+        sdk = FakeSDK(items)
+        path = str(tmp_path / "participants.db")
+
+        with ParticipantStore("p1", path) as store:
+            assert store.refresh(sdk) == {
+                "added": 5,
+                "updated": 0,
+                "unchanged": 0,
+                "removed": 0,
+            }
+            assert len(store) == 5
+            assert store.refresh(sdk) == {
+                "added": 0,
+                "updated": 0,
+                "unchanged": 5,
+                "removed": 0,
+            }
+
+            # 1 changed, 2 left, 5 joined and 3 showed up twice
+            items[1] = make_item(1, "2021-01-01T00:00:00.000Z", first_name="Uno")
+            del items[2]
+            items.append(make_item(5))
+            items.append(make_item(3))
+            assert store.refresh(sdk) == {
+                "added": 1,
+                "updated": 1,
+                "unchanged": 3,
+                "removed": 1,
+            }
+
+            assert store.get("id-0001") == {
+                "first_name": "Uno",
+                "customer_id": "cust-1",
+                "phone": "+13035550001",
+            }
+            assert store.get("id-0002") is None
+            assert store.refresh(sdk, full=True)["updated"] == 5
+
+        # it's all still there next time
+        with ParticipantStore("p1", path) as store:
+            assert [r["customer_id"] for r in store.records()] == [
+                "cust-0",
+                "cust-1",
+                "cust-3",
+                "cust-4",
+                "cust-5",
+            ]
+
+        with pytest.raises(ValueError):
+            ParticipantStore("p2", path)
+
+    def test_lookups(self):
+
+        items = [
+            make_item(n, groups=("All", "Odd") if n % 2 else ("All",)) for n in range(5)
+        ]
+        store = ParticipantStore("p1")
+        store.refresh(FakeSDK(items))
+
+        assert [r["customer_id"] for r in store.by_customer_id("cust-3")] == ["cust-3"]
+        assert store.by_customer_id("nobody") == []
+        assert [r["customer_id"] for r in store.by_phone("(303) 555-0004")] == [
+            "cust-4"
+        ]
+        assert store.by_phone("555") == []
+        assert [r["customer_id"] for r in store.in_group("Odd")] == ["cust-1", "cust-3"]
+        assert len(store.in_group("All")) == 5
+
+        # group changes are picked up along with the profile
+        items[3] = make_item(3, "2021-01-01T00:00:00.000Z", groups=("All",))
+        store.refresh(FakeSDK(items))
+        assert [r["customer_id"] for r in store.in_group("Odd")] == ["cust-1"]
+
+        store.close()
+
+    def test_include_agg(self):
+
+        items = [make_item(n) for n in range(3)]
+        store = ParticipantStore("p1", include_agg=True)
+        store.refresh(FakeSDK(items))
+        assert store.get("id-0002")["agg_sentCount"] == 2
+
+        # counts change without the profile
+        items[2]["sentCount"] = 9
+        assert store.refresh(FakeSDK(items))["updated"] == 1
+        assert store.get("id-0002")["agg_sentCount"] == 9
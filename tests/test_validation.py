@@ -0,0 +1,90 @@
+import logging
+import pandas as pd
+import pytest
+from signalvine_sdk.common import ValidationError
+from signalvine_sdk.validation import raise_for_problems, schema_rules, validate_records
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = {
+    "first_name": "String",
+    "act": "Maybe (Numeric)",
+    "aspgpa": "Maybe (Float)",
+    "honors": "Maybe (Boolean)",
+    "decision_date": "Maybe (Date)",
+}
+
+
+def make_frame(rows):
+    return pd.DataFrame(
+        {
+            "customer_id": [f"cust-{n}" for n in range(rows)],
+            "first_name": [f"First{n}" for n in range(rows)],
+            "act": [str(20 + n % 16) if n % 3 else "" for n in range(rows)],
+            "aspgpa": [f"{2 + (n % 200) / 100:.2f}" for n in range(rows)],
+            "honors": ["true" if n % 2 else "False" for n in range(rows)],
+            "decision_date": ["2021-03-01" if n % 5 else None for n in range(rows)],
+        }
+    )
+
+
+class TestClass:
+    def test_schema_rules(self):
+
+        rules = schema_rules(SCHEMA)
+        assert rules["decision_date"] == {"type": "date", "required": False}
+        assert rules["first_name"] == {"type": "str", "required": True}
+        assert rules["act"] == {"type": "int", "required": False}
+        assert rules["phone"]["type"] == "str"
+
+    def test_validate_records(self):
+
+        df = make_frame(10)
+        assert validate_records(df, SCHEMA) == []
+
+        df.loc[2, "first_name"] = " "
+        df.loc[3, "act"] = "21.5"
+        df.loc[4, "act"] = "lots"
+        df.loc[5, "aspgpa"] = "3,5"
+        df.loc[6, "honors"] = "yes"
+        df.loc[7, "decision_date"] = "someday"
+        df["shoe_size"] = "9"
+
+        assert validate_records(df, SCHEMA) == [
+            {"column": "first_name", "problem": "missing", "rows": [2]},
+            {"column": "act", "problem": "not an integer", "rows": [3, 4]},
+            {"column": "aspgpa", "problem": "not a number", "rows": [5]},
+            {"column": "honors", "problem": "not a boolean", "rows": [6]},
+            {"column": "decision_date", "problem": "not a date", "rows": [7]},
+            {"column": "shoe_size", "problem": "unknown column", "rows": None},
+        ]
+
+    def test_typed_columns(self):
+
+        df = pd.DataFrame(
+            {
+                "act": [20.0, None, 21.0],
+                "aspgpa": [3.5, None, 2.0],
+                "honors": [True, False, True],
+                "decision_date": pd.to_datetime(["2021-03-01", None, "2021-03-02"]),
+            },
+            index=["a", "b", "c"],
+        )
+        assert validate_records(df, SCHEMA) == []
+
+        df.loc["c", "act"] = 21.5
+        assert validate_records(df, SCHEMA) == [
+            {"column": "act", "problem": "not an integer", "rows": ["c"]}
+        ]
+
+    def test_raise_for_problems(self):
+
+        raise_for_problems([])
+
+        df = make_frame(20)
+        df["act"] = "lots"
+        with pytest.raises(ValidationError) as e:
+            raise_for_problems(validate_records(df, SCHEMA), max_rows=3)
+
+        assert e.value.problems[0]["rows"] == list(range(20))
+        assert "act: not an integer in rows 0, 1, 2 and 17 more" in e.value.message